@@ -5,7 +5,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.v1.authentication import get_superuser
 from db.postgres import get_pg_session
-from models.db_entity import User
 from schemas.model import (
     PermissionCreateReq,
     PermissionInfoResp,
@@ -15,6 +14,7 @@ from schemas.model import (
     RolesListResp,
 )
 from services.admin_roles import AdminRolesService, get_admin_roles_service
+from services.principal_cache import Principal
 
 router = APIRouter()
 
@@ -23,7 +23,7 @@ router = APIRouter()
 async def get_permissions(
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ) -> PermissionsListResp:
     return await admin_roles_service.get_all_permissions(db=db)
 
@@ -33,7 +33,7 @@ async def create_permission(
     permission_data: PermissionCreateReq,
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ) -> PermissionInfoResp:
     return await admin_roles_service.create_permission(db=db, permission_data=permission_data)
 
@@ -43,7 +43,7 @@ async def delete_permission(
     permission_name: str,
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ) -> None:
     return await admin_roles_service.delete_permission(db=db, permission_name=permission_name)
 
@@ -52,7 +52,7 @@ async def delete_permission(
 async def get_roles(
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ) -> RolesListResp:
     return await admin_roles_service.get_all_roles(db=db)
 
@@ -62,7 +62,7 @@ async def create_role(
     role_data: RoleCreateReq,
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ) -> RoleInfoResp:
     return await admin_roles_service.create_role(db=db, role_data=role_data)
 
@@ -72,7 +72,7 @@ async def get_role_permissions(
     role_name: str,
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ) -> PermissionsListResp:
     return await admin_roles_service.get_permissions_by_role(db=db, role_name=role_name)
 
@@ -83,7 +83,7 @@ async def update_role_permissions(
     permissions: List[str],
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ) -> RoleInfoResp:
     return await admin_roles_service.update_role_permissions(db=db, role_name=role_name, permissions=permissions)
 
@@ -93,6 +93,6 @@ async def delete_permission(
     role_name: str,
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ) -> None:
     return await admin_roles_service.delete_role(db=db, role_name=role_name)
@@ -1,15 +1,17 @@
+from typing import List
+
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import UUID4
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.v1.authentication import get_superuser
 from db.postgres import get_pg_session
-from models.db_entity import User
-from schemas.model import UserRolesResp
+from schemas.model import UserRolesResp, UsersRolesResp
 from services.base import BaseService, get_base_service
+from services.principal_cache import Principal
 
 router = APIRouter()
 
@@ -24,7 +26,7 @@ async def get_user_roles_list(
     user_id: UUID4,
     db: AsyncSession = Depends(get_pg_session),
     base_service: BaseService = Depends(get_base_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ):
     """
     Endpoint to get info regarding user roles.
@@ -38,6 +40,26 @@ async def get_user_roles_list(
     return UserRolesResp(user_id=str(user.id), user_name=user.email, roles=user_roles)
 
 
+@router.get(
+    "/admin/users/roles",
+    status_code=status.HTTP_200_OK,
+    response_model=UsersRolesResp,
+    description="Roles of many users at once",
+)
+async def get_users_roles_list(
+    user_ids: List[UUID4] = Query(),
+    db: AsyncSession = Depends(get_pg_session),
+    base_service: BaseService = Depends(get_base_service),
+    su_user: Principal = Depends(get_superuser),
+):
+    """
+    Endpoint to get roles of many users, e.g. for admin listing screens.
+    """
+    users_roles = await base_service.get_roles_for_users(db, [str(user_id) for user_id in user_ids])
+
+    return UsersRolesResp(data=users_roles)
+
+
 @router.put(
     "/admin/users/{user_id}/roles/{role_id}",
     status_code=status.HTTP_200_OK,
@@ -49,7 +71,7 @@ async def add_role_to_user(
     role_id: UUID4,
     db: AsyncSession = Depends(get_pg_session),
     base_service: BaseService = Depends(get_base_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ):
     """
     Endpoint to add a role to a user.
@@ -82,7 +104,7 @@ async def delete_role_from_user(
     role_id: UUID4,
     db: AsyncSession = Depends(get_pg_session),
     base_service: BaseService = Depends(get_base_service),
-    su_user: User = Depends(get_superuser),
+    su_user: Principal = Depends(get_superuser),
 ):
     """
     Endpoint to remove a role from a user.
@@ -13,12 +13,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from core.settings import settings
 from db.postgres import get_pg_session
 from helpers.providers import SocialNetworksNames
-from models.db_entity import User
 from schemas.cookie import AccessTokenCookie, RefreshTokenCookie
 from schemas.model import AccessTokenData, SNUserRegisteredResp, SNUserRegistrationReq, UserLoginReq
+from services.admin_roles import AdminRolesService, get_admin_roles_service
 from services.authentication import AuthenticationService, get_authentication_service
 from services.base import BaseService, get_base_service
 from services.jwt_token import JWTService, get_jwt_service
+from services.principal_cache import Principal, principal_cache
 from services.registration import RegistrationService, UserRegisteredResp, UserRegistrationReq, get_registration_service
 
 router = APIRouter()
@@ -43,26 +44,25 @@ async def check_access_token(
 
 async def get_user(
     db: Annotated[AsyncSession, Depends(get_pg_session)],
-    base_service: Annotated[BaseService, Depends(get_base_service)],
     access_token_dict: Annotated[Dict, Depends(check_access_token)],
-) -> User:
+) -> Principal:
     """
     Checks if user_id, received in JWT token exists in DB.
     Depends on func 'check_access_token'.
-    Returns User DB model.
+    Returns cached Principal of the user.
     """
 
     access_token = AccessTokenData(**access_token_dict)
 
-    db_user = await base_service.get_user_by_uuid(db, user_id=access_token.user_id)
+    principal = await principal_cache.get(db, user_id=access_token.user_id)
 
-    if not db_user:
+    if not principal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
-    return db_user
+    return principal
 
 
-async def get_current_active_user(user: Annotated[User, Depends(get_user)]) -> User:
+async def get_current_active_user(user: Annotated[Principal, Depends(get_user)]) -> Principal:
     """
     Checks if received from DB user is active.
     Depends on func 'get_user'.
@@ -73,7 +73,7 @@ async def get_current_active_user(user: Annotated[User, Depends(get_user)]) -> U
     return user
 
 
-async def get_superuser(user: Annotated[User, Depends(get_current_active_user)]) -> User:
+async def get_superuser(user: Annotated[Principal, Depends(get_current_active_user)]) -> Principal:
     """
     Checks if received from DB user is superuser.
     Depends on func 'get_current_active_user'.
@@ -127,12 +127,15 @@ async def login_user_for_access_token_cookie(
     db: AsyncSession = Depends(get_pg_session),
     base_service: BaseService = Depends(get_base_service),
     authentication_service: AuthenticationService = Depends(get_authentication_service),
+    admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
 ):
     """
     User login endpoint
     """
     try:
         user = await authentication_service.authenticate_user(db, form_data.email, form_data.password)
+    except HTTPException:
+        raise
     except Exception as excp:
         logging.exception("Unable to get user %s. The following error occured: %s", form_data.email, excp)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="internal server error")
@@ -146,12 +149,17 @@ async def login_user_for_access_token_cookie(
     try:
         user_roles_list = await base_service.get_user_roles(db, user.id)
         user_roles = [jsonable_encoder(role) for role in user_roles_list]
+        user_permissions = await admin_roles_service.get_permissions_for_roles(
+            db, [role.id for role in user_roles_list]
+        )
 
     except Exception as excp:
         logging.exception("Unable to get roles for user %s. The following error occured: %s", form_data.email, excp)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="internal server error")
 
-    access_token, refresh_token = await authentication_service.get_tokens(user_id=str(user.id), user_roles=user_roles)
+    access_token, refresh_token = await authentication_service.get_tokens(
+        user_id=str(user.id), user_roles=user_roles, user_permissions=user_permissions
+    )
 
     response.set_cookie(key=AccessTokenCookie.name, value=access_token, httponly=True)
     response.set_cookie(key=RefreshTokenCookie.name, value=refresh_token, httponly=True)
@@ -2,9 +2,22 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
+from db.postgres import get_pool_stats
+from services.password_hashing import password_hasher
+
 router = APIRouter()
 
 
 @router.get("/check")
 async def health_check() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/check/pg_pool")
+async def pg_pool_stats() -> dict[str, int]:
+    return get_pool_stats()
+
+
+@router.get("/check/password_hashing")
+async def password_hashing_stats() -> dict[str, float]:
+    return password_hasher.get_stats()
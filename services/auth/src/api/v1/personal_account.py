@@ -1,5 +1,6 @@
 from typing import Annotated
 
+from datetime import datetime
 from math import ceil
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -9,7 +10,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.v1.authentication import check_access_token, get_current_active_user
 from db.postgres import get_pg_session
-from models.db_entity import User
 from schemas.model import (
     AccessTokenData,
     ResetCredentialsResp,
@@ -21,6 +21,7 @@ from schemas.model import (
 )
 from services.base import BaseService, get_base_service
 from services.pagination import Pagination, SortEnum, pagination_params
+from services.principal_cache import Principal
 
 router = APIRouter()
 
@@ -42,7 +43,7 @@ async def check_user_id(user_id: UUID4, access_token_dict: dict) -> None:
 )
 async def get_user_account_info(
     user_id: UUID4,
-    db_user: User = Depends(get_current_active_user),
+    db_user: Principal = Depends(get_current_active_user),
     access_token_dic: dict = Depends(check_access_token),
 ):
     """
@@ -68,27 +69,39 @@ async def get_user_login_history_info(
     user_id: UUID4,
     db: AsyncSession = Depends(get_pg_session),
     base_service: BaseService = Depends(get_base_service),
-    db_user: User = Depends(get_current_active_user),
+    db_user: Principal = Depends(get_current_active_user),
     access_token_dic: dict = Depends(check_access_token),
+    since: datetime | None = None,
+    until: datetime | None = None,
 ) -> UserLoginHistoryResp:
     """
-    Returns paginated details regarding user login history.
+    Returns paginated details regarding user login history, optionally within [since, until).
+    Pass next_cursor of a page as cursor to get the following one, page is kept for older clients
+    and is null in pages fetched by cursor.
     """
     await check_user_id(user_id, access_token_dic)
 
     offset = pagination.get_offset()
     order = desc if pagination.order == SortEnum.DESC else asc
 
-    login_history, count = await base_service.get_user_login_history(
-        db, db_user.id, limit=pagination.per_page, offset=offset, order=order
+    login_history, count, next_cursor = await base_service.get_user_login_history(
+        db,
+        db_user.id,
+        limit=pagination.per_page,
+        offset=offset,
+        order=order,
+        since=since,
+        until=until,
+        cursor=pagination.cursor,
     )
 
     return UserLoginHistoryResp(
-        page=pagination.page,
+        page=pagination.page if pagination.cursor is None else None,
         total_pages=ceil(count / pagination.per_page),
         total_entries=count,
         per_page=pagination.per_page,
         data=login_history,
+        next_cursor=next_cursor,
     )
 
 
@@ -103,7 +116,7 @@ async def update_user_email(
     user_data: UserResetEmailReq,
     db: AsyncSession = Depends(get_pg_session),
     base_service: BaseService = Depends(get_base_service),
-    db_user: User = Depends(get_current_active_user),
+    db_user: Principal = Depends(get_current_active_user),
     access_token_dic: dict = Depends(check_access_token),
 ) -> ResetCredentialsResp:
     """
@@ -130,7 +143,7 @@ async def update_user_password(
     user_data: UserResetPasswordReq,
     db: AsyncSession = Depends(get_pg_session),
     base_service: BaseService = Depends(get_base_service),
-    db_user: User = Depends(get_current_active_user),
+    db_user: Principal = Depends(get_current_active_user),
     access_token_dic: dict = Depends(check_access_token),
 ) -> ResetPasswordResp:
     """
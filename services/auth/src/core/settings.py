@@ -39,6 +39,12 @@ class PostgresSettings(DefaultSettings):
     dsn: str = Field("")
     dsn_local: str = Field("")
     dsn_pg: str = Field("")
+    echo: bool = Field(default=False)
+    pool_size: int = Field(default=10)
+    max_overflow: int = Field(default=20)
+    pool_timeout: float = Field(default=30.0)
+    pool_recycle: int = Field(default=1800)
+    pool_pre_ping: bool = Field(default=True)
 
     model_config = SettingsConfigDict(env_prefix="POSTGRES_")
 
@@ -51,6 +57,51 @@ class RedisSettings(DefaultSettings):
     model_config = SettingsConfigDict(env_prefix="REDIS_")
 
 
+class RoleCacheSettings(DefaultSettings):
+    version_key: str = Field(default="role_graph_version")
+    key_prefix: str = Field(default="role_graph:")
+    ttl: int = Field(default=60 * 60)
+    user_roles_prefix: str = Field(default="user_roles:")
+    user_roles_generation_key: str = Field(default="user_roles_generation")
+    local_maxsize: int = Field(default=10_000)
+    local_ttl: float = Field(default=5.0)
+
+    model_config = SettingsConfigDict(env_prefix="ROLE_CACHE_")
+
+
+class PasswordHashingSettings(DefaultSettings):
+    executor: str = Field(default="thread", description="thread or process pool")
+    workers: int = Field(default=4)
+    max_pending: int = Field(default=64)
+
+    model_config = SettingsConfigDict(env_prefix="PASSWORD_HASHING_")
+
+
+class PrincipalCacheSettings(DefaultSettings):
+    prefix: str = Field(default="principal:")
+    ttl: int = Field(default=5 * 60)
+    local_maxsize: int = Field(default=10_000)
+    local_ttl: float = Field(default=5.0)
+
+    model_config = SettingsConfigDict(env_prefix="PRINCIPAL_CACHE_")
+
+
+class LoginHistorySettings(DefaultSettings):
+    queue_size: int = Field(default=10_000)
+    batch_size: int = Field(default=500)
+    flush_interval_ms: int = Field(default=200)
+    retry_backoff_max: float = Field(default=30.0, description="Upper bound of a batch retry delay, seconds")
+    partition_months_ahead: int = Field(default=3)
+    retention_months: int = Field(default=12)
+    drop_expired: bool = Field(default=False, description="Drop detached partitions instead of keeping them")
+    maintenance_interval_hours: float = Field(default=6)
+    lock_id: int = Field(default=5_302_024)
+    count_prefix: str = Field(default="login_history_count:")
+    count_ttl: int = Field(default=60 * 60)
+
+    model_config = SettingsConfigDict(env_prefix="LOGIN_HISTORY_")
+
+
 class Settings(DefaultSettings):
     """Class to store fastapi project settings."""
 
@@ -60,8 +111,16 @@ class Settings(DefaultSettings):
     api_port: str = Field("api_port", env="API_PORT")
     # Redis
     redis: RedisSettings = RedisSettings()
+    # Role/permission graph cache
+    role_cache: RoleCacheSettings = RoleCacheSettings()
+    # Authenticated user cache
+    principal_cache: PrincipalCacheSettings = PrincipalCacheSettings()
     # Postgres
     pg: PostgresSettings = PostgresSettings()
+    # Background login history writer
+    login_history: LoginHistorySettings = LoginHistorySettings()
+    # Password hashing pool
+    password_hashing: PasswordHashingSettings = PasswordHashingSettings()
     # Backoff
     backoff: BackoffSettings = BackoffSettings()
 
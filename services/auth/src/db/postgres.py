@@ -1,6 +1,47 @@
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+engine: AsyncEngine | None = None
+async_session: async_sessionmaker[AsyncSession] | None = None
+
+
+def create_engine() -> AsyncEngine:
+    """
+    Creates a pooled engine.
+    It is called once per gunicorn worker from the lifespan, every
+    UvicornWorker process owns its own pool.
+    """
+    from core.settings import settings
+
+    return create_async_engine(
+        url=settings.pg.dsn,
+        echo=settings.pg.echo,
+        pool_size=settings.pg.pool_size,
+        max_overflow=settings.pg.max_overflow,
+        pool_timeout=settings.pg.pool_timeout,
+        pool_recycle=settings.pg.pool_recycle,
+        pool_pre_ping=settings.pg.pool_pre_ping,
+    )
+
+
+def create_session_factory(bind: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(bind=bind, class_=AsyncSession, expire_on_commit=False)
+
+
+def get_pool_stats() -> dict:
+    """
+    Returns state of the connection pool of the current worker.
+    """
+    if engine is None:
+        return {}
+    pool = engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
 
 
 async def get_pg_session() -> AsyncGenerator[AsyncSession, None]:
@@ -17,10 +58,5 @@ async def get_pg_session() -> AsyncGenerator[AsyncSession, None]:
                     raise e
     """
 
-    from core.settings import settings
-
-    engine = create_async_engine(url=settings.pg.dsn, echo=True, future=True)
-    async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
-
     async with async_session() as session:
         yield session
@@ -1,5 +1,6 @@
 from typing import AsyncGenerator
 
+import asyncio
 import logging
 
 from contextlib import asynccontextmanager
@@ -12,12 +13,20 @@ from redis.asyncio import Redis
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     from core.settings import settings
-    from db import redis_db
+    from db import postgres, redis_db
     from helpers.jaeger import configure_tracer
+    from services.login_history_partitions import login_history_partitions
+    from services.login_history_writer import login_history_writer
+    from services.password_hashing import password_hasher
 
     # On startup events
     logging.info("Config: %s", vars(settings))
+    postgres.engine = postgres.create_engine()
+    postgres.async_session = postgres.create_session_factory(postgres.engine)
     redis_db.redis = Redis(host=settings.redis.host, port=settings.redis.port)
+    password_hasher.start()
+    login_history_writer.start()
+    partitions_maintenance = asyncio.create_task(login_history_partitions.run())
     if settings.fastapi_enable_limiter:
         await FastAPILimiter.init(redis_db.redis)
 
@@ -26,6 +35,10 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 
     yield
     # On shutdown events
+    partitions_maintenance.cancel()
+    await login_history_writer.stop()
     await redis_db.redis.close()
+    await postgres.engine.dispose()
+    password_hasher.shutdown()
     if settings.fastapi_enable_limiter:
         await FastAPILimiter.close()
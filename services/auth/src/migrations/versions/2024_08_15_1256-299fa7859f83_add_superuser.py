@@ -12,6 +12,7 @@ from alembic import op
 from core.settings import settings
 from models import User
 from sqlalchemy import orm
+from werkzeug.security import generate_password_hash
 
 # revision identifiers, used by Alembic.
 revision: str = "299fa7859f83"
@@ -23,7 +24,9 @@ depends_on: Union[str, Sequence[str], None] = None
 def upgrade() -> None:
     bind = op.get_bind()
     session = orm.Session(bind=bind)
-    su = User(**settings.su.model_dump())
+    su_settings = settings.su.model_dump()
+    su_settings["hashed_password"] = generate_password_hash(su_settings["hashed_password"])
+    su = User(**su_settings)
     session.add(su)
     session.commit()
     session.refresh(su)
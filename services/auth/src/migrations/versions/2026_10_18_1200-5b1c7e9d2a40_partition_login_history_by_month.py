@@ -0,0 +1,157 @@
+"""partition login history by month
+
+Revision ID: 5b1c7e9d2a40
+Revises: 299fa7859f83
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from datetime import UTC, date, datetime
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import text
+
+# revision identifiers, used by Alembic.
+revision: str = "5b1c7e9d2a40"
+down_revision: Union[str, None] = "299fa7859f83"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months created ahead of the current one, the maintenance job keeps the window from then on
+PARTITION_MONTHS_AHEAD = 3
+
+
+# Frozen copies of services.login_history_partitions helpers as of this revision,
+# intentionally not imported from the app, so later changes there do not alter the migration.
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    return datetime.now(UTC).date().replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f"login_history_y{month.year:04d}m{month.month:02d}"
+
+
+def create_partition_login_history(first_month, last_month) -> None:
+    """
+    Creating monthly partitions by timestamp and a default partition for rows out of them.
+    Months older than the retention period get partitions too, the maintenance job detaches them.
+    """
+    month = first_month
+    while month <= last_month:
+        op.execute(
+            text(
+                f"""
+                CREATE TABLE IF NOT EXISTS "{partition_name(month)}"
+                PARTITION OF login_history_parent
+                FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"""
+            )
+        )
+        month = add_months(month, 1)
+    op.execute(text('CREATE TABLE IF NOT EXISTS "login_history_default" PARTITION OF login_history_parent DEFAULT'))
+
+
+def upgrade() -> None:
+    op.rename_table("login_history_parent", "login_history_weekday")
+    op.execute(
+        text(
+            "ALTER TABLE login_history_weekday RENAME CONSTRAINT login_history_parent_pkey TO login_history_weekday_pkey"
+        )
+    )
+    op.execute(text("ALTER TABLE login_history_weekday DROP CONSTRAINT IF EXISTS login_history_parent_id_weekday_key"))
+    op.create_table(
+        "login_history_parent",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("ip_address", sa.String(length=15), nullable=True),
+        sa.Column("location", sa.String(length=255), nullable=True),
+        sa.Column("user_agent", sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id", "timestamp"),
+        sa.UniqueConstraint("id", "timestamp"),
+        postgresql_partition_by="RANGE (timestamp)",
+    )
+
+    oldest = op.get_bind().scalar(text("SELECT min(timestamp) FROM login_history_weekday"))
+    first_month = oldest.date().replace(day=1) if oldest else current_month()
+    create_partition_login_history(first_month, add_months(current_month(), PARTITION_MONTHS_AHEAD))
+
+    op.execute(
+        text(
+            """
+            INSERT INTO login_history_parent (id, user_id, timestamp, ip_address, location, user_agent)
+            SELECT id, user_id, coalesce(timestamp, now()), ip_address, location, user_agent
+            FROM login_history_weekday"""
+        )
+    )
+    for day in range(0, 7):
+        op.drop_table(f"login_history_{day}")
+    op.drop_table("login_history_weekday")
+
+
+def downgrade() -> None:
+    op.rename_table("login_history_parent", "login_history_monthly")
+    op.execute(
+        text(
+            "ALTER TABLE login_history_monthly RENAME CONSTRAINT login_history_parent_pkey TO login_history_monthly_pkey"
+        )
+    )
+    op.execute(
+        text("ALTER TABLE login_history_monthly DROP CONSTRAINT IF EXISTS login_history_parent_id_timestamp_key")
+    )
+    op.create_table(
+        "login_history_parent",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("weekday", sa.Integer(), nullable=False),
+        sa.Column("ip_address", sa.String(length=15), nullable=True),
+        sa.Column("location", sa.String(length=255), nullable=True),
+        sa.Column("user_agent", sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id", "weekday"),
+        sa.UniqueConstraint("id", "weekday"),
+        postgresql_partition_by="LIST (weekday)",
+    )
+    for day in range(0, 7):
+        op.execute(
+            text(
+                f"""
+                CREATE TABLE IF NOT EXISTS "login_history_{day}"
+                PARTITION OF login_history_parent
+                FOR VALUES IN ({day})"""
+            )
+        )
+
+    op.execute(
+        text(
+            """
+            INSERT INTO login_history_parent (id, user_id, timestamp, weekday, ip_address, location, user_agent)
+            SELECT id, user_id, timestamp, extract(isodow FROM timestamp)::int - 1, ip_address, location, user_agent
+            FROM login_history_monthly"""
+        )
+    )
+    partitions = (
+        op.get_bind()
+        .scalars(
+            text(
+                """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+            JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+            WHERE parent.relname = 'login_history_monthly'"""
+            )
+        )
+        .all()
+    )
+    for partition in partitions:
+        op.drop_table(partition)
+    op.drop_table("login_history_monthly")
@@ -2,9 +2,8 @@ import uuid
 
 from datetime import UTC, datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, UniqueConstraint, text
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID
-from werkzeug.security import check_password_hash, generate_password_hash
 
 from models.base import Base
 from models.mixins import UUIDMixin
@@ -32,21 +31,17 @@ class User(UUIDMixin, Base):
         is_verified: bool | None = None,
         registered_at: datetime | None = None,
     ) -> None:
+        """
+        Takes a password already hashed by services.password_hashing.password_hasher.
+        """
         super().__init__()
         self.email = email
-        self.hashed_password = self.hashed_password = generate_password_hash(hashed_password)
+        self.hashed_password = hashed_password
         self.is_active = is_active
         self.is_superuser = is_superuser
         self.is_verified = is_verified
         self.registered_at = registered_at
 
-    async def check_password(self, password: str) -> bool:
-        return check_password_hash(self.hashed_password, password)
-
-    @staticmethod
-    async def get_password_hashed(password) -> str:
-        return generate_password_hash(password)
-
     def __repr__(self) -> str:
         return f"<User {self.email}>"
 
@@ -101,11 +96,15 @@ class LoginHistory(Base):
     """
 
     __tablename__ = "login_history_parent"
-    __table_args__ = (UniqueConstraint("id", "weekday"), {"postgresql_partition_by": "LIST (weekday)"})
+    __table_args__ = (UniqueConstraint("id", "timestamp"), {"postgresql_partition_by": "RANGE (timestamp)"})
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    timestamp = Column(DateTime)
-    weekday = Column(Integer, primary_key=True, default=lambda: datetime.now(UTC).weekday())
+    # Monthly partitions are kept by services.login_history_partitions
+    timestamp = Column(DateTime, primary_key=True, default=lambda: datetime.now(UTC), nullable=False)
     ip_address = Column(String(15))
     location = Column(String(255))
     user_agent = Column(String(255))
+
+
+# Serves keyset pagination of a user's history, created on every partition
+Index("ix_login_history_user_id_timestamp", LoginHistory.user_id, LoginHistory.timestamp.desc(), LoginHistory.id.desc())
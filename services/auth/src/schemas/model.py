@@ -62,11 +62,12 @@ class UserLoginHistory(BaseModel):
 
 
 class UserLoginHistoryResp(BaseModel):
-    page: int
+    page: int | None
     total_pages: int
     total_entries: int
     per_page: int
     data: List[UserLoginHistory]
+    next_cursor: str | None = None
 
 
 class UserRoles(BaseModel):
@@ -80,6 +81,10 @@ class UserRolesResp(BaseModel):
     roles: List[UserRoles] | List
 
 
+class UsersRolesResp(BaseModel):
+    data: dict[str, List[UserRoles]]
+
+
 class UserPermissionsResp(BaseModel):
     result: str
     data: str
@@ -116,9 +121,15 @@ class RoleInfoResp(BaseModel):
     permissions: List[PermissionInfoResp]
 
 
+def get_default_permissions() -> list[str]:
+    return [name.value for name in UgcEndpoints]
+
+
 class PermissionsListMixin(BaseModel):
     type: str = Field(default="access")
-    permissions: list[str] = Field(default_factory=lambda: [name.value for name in UgcEndpoints])
+    permissions: list[str] = Field(default_factory=get_default_permissions)
+    # Services cache compiled permission sets by this digest
+    permissions_digest: str | None = None
 
 
 class AccessTokenData(PermissionsListMixin):
@@ -144,6 +155,7 @@ class RefreshTokenData(BaseModel):
     iat: datetime.datetime
     exp: datetime.datetime
     roles: list | None
+    permissions: list[str] | None = None
     session_id: str
 
     @field_validator("iat", mode="after")
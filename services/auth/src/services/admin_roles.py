@@ -1,13 +1,20 @@
 from typing import Generic, List, Type, TypeVar, Union
 
+import logging
+
 from functools import lru_cache
 
-from fastapi import HTTPException, status
+from fastapi import Depends, HTTPException, status
 from pydantic import BaseModel
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import delete, select
 
+from core.settings import settings
+from db.redis_db import get_redis
 from models.db_entity import Permission, Role, RolePermission
+from services.role_cache import user_role_cache
 from schemas.model import (
     PermissionCreateReq,
     PermissionCreateResp,
@@ -23,7 +30,21 @@ T = TypeVar("T")
 
 
 class AdminRolesService(Generic[T]):
-    def __init__(self): ...
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    @staticmethod
+    def _role_graph_key(version: int) -> str:
+        return f"{settings.role_cache.key_prefix}{version}"
+
+    async def invalidate_role_graph(self) -> None:
+        """
+        Moves the role graph cache to a new version, entries of older versions expire by TTL.
+        """
+        try:
+            await self.redis.incr(settings.role_cache.version_key)
+        except RedisError as excp:
+            logging.exception("Unable to invalidate role graph cache: %s", excp)
 
     async def create_permission(self, db: AsyncSession, permission_data: PermissionCreateReq) -> PermissionInfoResp:
         permission_exists = await self._check_entity_exists(entity_type=Permission, db=db, name=permission_data.name)
@@ -54,6 +75,7 @@ class AdminRolesService(Generic[T]):
         if role_exists:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Роль уже существует")
         result = await self.add_role(db, role_data)
+        await self.invalidate_role_graph()
         return result
 
     @staticmethod
@@ -65,31 +87,56 @@ class AdminRolesService(Generic[T]):
         return RoleCreateResp(role_id=str(role.id), name=role.name, permissions=[])
 
     async def get_all_roles(self, db: AsyncSession) -> RolesListResp:
-        statement = select(Role)
-        statement_result = await db.execute(statement=statement)
-        roles = statement_result.scalars()
-        roles_data = []
-        for role in roles:
-            statement_role_permission = select(RolePermission).where(RolePermission.role_id == role.id)
-            statement_role_permission_result = await db.execute(statement_role_permission)
-            role_permissions = statement_role_permission_result.scalars()
-
-            roles_data.append(
-                RoleInfoResp(
-                    role_id=str(role.id),
-                    name=role.name,
-                    permissions=[
-                        PermissionInfoResp(
-                            permission_id=str(rp.permission_id),
-                            name=(
-                                await self._get_entity_by_id(entity_type=Permission, db=db, entity_id=rp.permission_id)
-                            ).name,
-                        )
-                        for rp in role_permissions
-                    ],
-                )
-            )
-        return RolesListResp(data=roles_data)
+        """
+        Returns the whole role/permission graph, cached in Redis under the current graph version.
+        """
+        version = None
+        try:
+            version = int(await self.redis.get(settings.role_cache.version_key) or 0)
+            cached_roles = await self.redis.get(self._role_graph_key(version))
+            if cached_roles is not None:
+                return RolesListResp.model_validate_json(cached_roles)
+        except RedisError as excp:
+            logging.exception("Unable to read role graph cache: %s", excp)
+
+        roles = await self._load_role_graph(db)
+        if version is not None:
+            try:
+                await self.redis.setex(self._role_graph_key(version), settings.role_cache.ttl, roles.model_dump_json())
+            except RedisError as excp:
+                logging.exception("Unable to save role graph cache: %s", excp)
+        return roles
+
+    @staticmethod
+    async def _load_role_graph(db: AsyncSession) -> RolesListResp:
+        """
+        Loads all roles with their permissions in one query.
+        """
+        statement = (
+            select(Role.id, Role.name, Permission.id, Permission.name)
+            .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+            .outerjoin(Permission, Permission.id == RolePermission.permission_id)
+            .order_by(Role.name, Permission.name)
+        )
+        statement_result = await db.execute(statement)
+        roles: dict[str, RoleInfoResp] = {}
+        for role_id, role_name, permission_id, permission_name in statement_result:
+            role = roles.setdefault(str(role_id), RoleInfoResp(role_id=str(role_id), name=role_name, permissions=[]))
+            if permission_id is not None:
+                role.permissions.append(PermissionInfoResp(permission_id=str(permission_id), name=permission_name))
+        return RolesListResp(data=list(roles.values()))
+
+    async def get_permissions_for_roles(self, db: AsyncSession, role_ids: List[str]) -> List[str]:
+        """
+        Returns names of permissions granted by the roles, read from the cached role graph.
+        """
+        role_ids = {str(role_id) for role_id in role_ids}
+        if not role_ids:
+            return []
+        roles = await self.get_all_roles(db)
+        return sorted(
+            {permission.name for role in roles.data if role.role_id in role_ids for permission in role.permissions}
+        )
 
     async def get_permissions_by_role(self, db: AsyncSession, role_name: str):
         role = await self._get_entity_by_name(entity_type=Role, db=db, entity_name=role_name)
@@ -116,6 +163,7 @@ class AdminRolesService(Generic[T]):
         db.add_all(role_permission_objects)
         await db.commit()
         await db.refresh(role)
+        await self.invalidate_role_graph()
         return RoleInfoResp(
             role_id=str(role.id),
             name=role.name,
@@ -135,6 +183,7 @@ class AdminRolesService(Generic[T]):
         await db.commit()
         await db.delete(permission)
         await db.commit()
+        await self.invalidate_role_graph()
 
     async def delete_role(self, role_name, db: AsyncSession) -> None:
         role = await self._get_entity_by_name(entity_type=Role, db=db, entity_name=role_name)
@@ -144,6 +193,8 @@ class AdminRolesService(Generic[T]):
         await db.commit()
         await db.delete(role)
         await db.commit()
+        await self.invalidate_role_graph()
+        await user_role_cache.invalidate_all()
 
     async def _check_entity_exists(self, entity_type: Type[T], db: AsyncSession, name: str) -> bool:
         statement = select(entity_type).where(entity_type.name == name)
@@ -169,5 +220,5 @@ class AdminRolesService(Generic[T]):
 
 
 @lru_cache
-def get_admin_roles_service() -> AdminRolesService:
-    return AdminRolesService[Union[Role, Permission]]()
+def get_admin_roles_service(redis: Redis = Depends(get_redis)) -> AdminRolesService:
+    return AdminRolesService[Union[Role, Permission]](redis)
@@ -17,6 +17,9 @@ from models.oauth import SocialNetworks
 from schemas.model import ExternalAuthenticationDetails, ExternalAuthorizationDetails, RefreshTokenData
 from services.helper import AsyncCache
 from services.jwt_token import JWTService, get_jwt_service
+from services.login_history_counter import login_history_counter
+from services.login_history_writer import login_history_writer
+from services.password_hashing import password_hasher
 from services.redis import RedisService, get_redis_service
 
 
@@ -65,7 +68,7 @@ class AuthenticationService:
         user = await AuthenticationService.get_user(db, email)
         if not user:
             return None
-        if not await user.check_password(password):
+        if not await password_hasher.check(user.hashed_password, password):
             return None
         return user
 
@@ -74,17 +77,15 @@ class AuthenticationService:
         db: AsyncSession, user_id: str, ip_address: str, location: str, user_agent: str
     ) -> None:
         """
-        Save user login info in the DB
+        Save user login info in the DB, by the background writer when it runs
         """
-        statement = insert(LoginHistory).values(
-            user_id=user_id,
-            timestamp=datetime.now(UTC),
-            ip_address=ip_address,
-            location=location,
-            user_agent=user_agent,
-        )
-        await db.execute(statement=statement)
+        event = login_history_writer.build_event(user_id, ip_address, location, user_agent)
+        if login_history_writer.started:
+            await login_history_writer.record(event)
+            return
+        await db.execute(insert(LoginHistory).values(event))
         await db.commit()
+        await login_history_counter.increment([event])
 
     @staticmethod
     async def generate_session_id() -> str:
@@ -97,10 +98,12 @@ class AuthenticationService:
 
         await self.redis_service.del_refresh_token(user_id=token.user_id, session_id=token.session_id)
 
-    async def get_tokens(self, user_id: str, user_roles: list | None) -> (str, str):
+    async def get_tokens(
+        self, user_id: str, user_roles: list | None, user_permissions: list[str] | None = None
+    ) -> (str, str):
         session_id = await self.generate_session_id()
         access_token, refresh_token = await self.jwt_service.get_token_pair(
-            user_id=user_id, session_id=session_id, roles=user_roles
+            user_id=user_id, session_id=session_id, roles=user_roles, permissions=user_permissions
         )
 
         try:
@@ -125,7 +128,9 @@ class AuthenticationService:
 
         await self.redis_service.redis.expire(name=redis_key, time=0)
 
-        access_token, refresh_token = await self.get_tokens(user_id=token.user_id, user_roles=token.roles)
+        access_token, refresh_token = await self.get_tokens(
+            user_id=token.user_id, user_roles=token.roles, user_permissions=token.permissions
+        )
 
         return access_token, refresh_token
 
@@ -1,14 +1,30 @@
-from typing import List
+from typing import Dict, List
 
+from datetime import UTC, datetime
 from functools import lru_cache
 
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import desc, func
+from sqlalchemy import and_, desc, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import delete, insert, select, update
 
 from models.db_entity import LoginHistory, Role, User, UserRole
 from schemas.model import ResetCredentialsResp, ResetPasswordResp, UserLoginHistory, UserRoles
+from services.login_history_counter import login_history_counter
+from services.login_history_partitions import history_window_start
+from services.pagination import decode_cursor, encode_cursor
+from services.password_hashing import password_hasher
+from services.principal_cache import principal_cache
+from services.role_cache import user_role_cache
+
+
+def to_naive_utc(value: datetime | None) -> datetime | None:
+    """
+    Login history timestamps are naive UTC, an aware datetime is converted to compare with them.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
 
 
 class BaseService:
@@ -42,16 +58,16 @@ class BaseService:
     @staticmethod
     async def get_user_roles(db: AsyncSession, user_id: str) -> [List[UserRoles] | List]:
         """
-        Searching for a user roles.
-        Returns DB User representation.
+        Searching for a user roles, served from the user roles cache.
         """
-        statement = select(Role.id, Role.name).where(UserRole.user_id == user_id, UserRole.role_id == Role.id)
-        statement_result = await db.execute(statement=statement)
-        user_roles = statement_result.all()
-        if not user_roles:
-            return []
+        return await user_role_cache.get_user_roles(db, user_id)
 
-        return [UserRoles(**jsonable_encoder(role._mapping)) for role in user_roles]
+    @staticmethod
+    async def get_roles_for_users(db: AsyncSession, user_ids: List[str]) -> Dict[str, List[UserRoles]]:
+        """
+        Searching for roles of many users at once, served from the user roles cache.
+        """
+        return await user_role_cache.get_roles_for_users(db, user_ids)
 
     @staticmethod
     async def check_email_exists(db: AsyncSession, email: str) -> bool:
@@ -62,35 +78,56 @@ class BaseService:
 
     @staticmethod
     async def get_user_login_history(
-        db: AsyncSession, user_id: str, limit: int = 50, offset: int = 0, order=desc
-    ) -> [List[UserLoginHistory], int]:
+        db: AsyncSession,
+        user_id: str,
+        limit: int = 50,
+        offset: int = 0,
+        order=desc,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        cursor: str | None = None,
+    ) -> [List[UserLoginHistory], int, str | None]:
         """
         Searching for a user login history in DB.
-        Returns amount of results depending on received pagination parameters.
+        Returns a page of results, the total count and the cursor of the next page.
+        A cursor continues after the row it points at by (timestamp, id) on the index, offset is used without it.
+        The time window lets Postgres scan only the monthly partitions it covers.
         """
+        since, until = to_naive_utc(since), to_naive_utc(until)
+        window = LoginHistory.timestamp >= max(since or history_window_start(), history_window_start())
+        if until is not None:
+            window = and_(window, LoginHistory.timestamp < until)
         statement = (
             select(LoginHistory)
-            .where(LoginHistory.user_id == user_id)
-            .limit(limit)
-            .offset(offset)
-            .order_by(order(LoginHistory.timestamp))
+            .where(LoginHistory.user_id == user_id, window)
+            .limit(limit + 1)
+            .order_by(order(LoginHistory.timestamp), order(LoginHistory.id))
         )
+        if cursor is not None:
+            position = tuple_(LoginHistory.timestamp, LoginHistory.id)
+            last_seen = tuple_(*decode_cursor(cursor), types=[LoginHistory.timestamp.type, LoginHistory.id.type])
+            statement = statement.where(position < last_seen if order is desc else position > last_seen)
+        elif offset:
+            statement = statement.offset(offset)
         statement_result = await db.execute(statement=statement)
-        login_history = statement_result.scalars()
-        if not login_history:
-            return [], 0
+        login_history = statement_result.scalars().all()
 
-        # Достаем из LoginHistory количество записей с LoginHistory.user_id == user_id
-        count_query = select(func.count()).select_from(
-            select(LoginHistory.user_id).where(LoginHistory.user_id == user_id).subquery()
-        )
-        count_result = await db.execute(statement=count_query)
-        count = count_result.scalar_one()
+        next_cursor = None
+        if len(login_history) > limit:
+            login_history = login_history[:limit]
+            next_cursor = encode_cursor(login_history[-1].timestamp, login_history[-1].id)
+
+        if since is None and until is None:
+            count = await login_history_counter.get(db, user_id)
+        else:
+            # Явно заданное окно короткое и затрагивает мало партиций, считаем его точно
+            count_query = select(func.count()).where(LoginHistory.user_id == user_id, window)
+            count = (await db.execute(statement=count_query)).scalar_one()
 
         # Получили из базы список из LoginHistory (схема БД)
         # берем каждый объект списка, декодируем в dict
         # dict распаковываем в UserLoginHistory - модель которую мы отдаем пользователю.
-        return [UserLoginHistory(**jsonable_encoder(login)) for login in login_history], count
+        return [UserLoginHistory(**jsonable_encoder(login)) for login in login_history], count, next_cursor
 
     @staticmethod
     async def update_user_email(db: AsyncSession, email: str, user_id: str) -> ResetCredentialsResp:
@@ -98,6 +135,7 @@ class BaseService:
 
         await db.execute(statement=statement)
         await db.commit()
+        await principal_cache.invalidate(user_id)
 
         statement = select(User.email).where(User.id == user_id)
         statement_result = await db.execute(statement=statement)
@@ -108,11 +146,12 @@ class BaseService:
 
     @staticmethod
     async def update_user_password(db: AsyncSession, password: str, user_id: str) -> ResetPasswordResp:
-        hashed_password = await User.get_password_hashed(password)
+        hashed_password = await password_hasher.hash(password)
         statement = update(User).values(hashed_password=hashed_password).where(User.id == user_id)
 
         await db.execute(statement=statement)
         await db.commit()
+        await principal_cache.invalidate(user_id)
 
         return ResetPasswordResp(user_id=str(user_id))
 
@@ -125,6 +164,8 @@ class BaseService:
 
         await db.execute(statement=statement)
         await db.commit()
+        await user_role_cache.invalidate_user(user_id)
+        await principal_cache.invalidate(user_id)
 
         result = await self.get_user_roles(db, user_id)
 
@@ -139,6 +180,8 @@ class BaseService:
 
         await db.execute(statement=statement)
         await db.commit()
+        await user_role_cache.invalidate_user(user_id)
+        await principal_cache.invalidate(user_id)
 
         result = await self.get_user_roles(db, user_id)
 
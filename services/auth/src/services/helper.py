@@ -1,4 +1,9 @@
+from typing import Any
+
+import time
+
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 
 
 class AsyncCache(ABC):
@@ -9,3 +14,37 @@ class AsyncCache(ABC):
     @abstractmethod
     async def set(self, key: str, value: str, expire: int, **kwargs):
         pass
+
+
+class LocalLRU:
+    """
+    Small in-process LRU cache with a single TTL for all entries.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
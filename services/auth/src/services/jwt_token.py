@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import uuid
 
@@ -9,11 +10,26 @@ from jose import JWTError, jwt
 
 from core.settings import settings
 from db.redis_db import get_redis
-from schemas.model import AccessTokenData, RefreshTokenData
+from schemas.model import AccessTokenData, RefreshTokenData, get_default_permissions
 
 from .helper import AsyncCache
 
 
+def compact_permissions(permissions: list[str]) -> list[str]:
+    """
+    Returns sorted unique permissions without the ones covered by a shorter prefix
+    """
+    compacted = []
+    for permission in sorted(set(permissions)):
+        if not compacted or not permission.startswith(compacted[-1]):
+            compacted.append(permission)
+    return compacted
+
+
+def get_permissions_digest(permissions: list[str]) -> str:
+    return hashlib.sha256("\n".join(permissions).encode("utf-8")).hexdigest()[:16]
+
+
 class JWTService:
     def __init__(self, cache: AsyncCache):
         self.cache = cache
@@ -23,12 +39,16 @@ class JWTService:
     access_token_expire = settings.jwt_at_expire_minutes
     refresh_token_expire = settings.jwt_rt_expire_minutes
 
-    async def get_token_pair(self, user_id: str, session_id: str, roles: list = None) -> (str, str):
+    async def get_token_pair(
+        self, user_id: str, session_id: str, roles: list = None, permissions: list[str] | None = None
+    ) -> (str, str):
         """
         Returns a pair of jwt tokens
         """
-        at_payload = await self.get_access_token_payload(user_id=user_id, roles=roles)
-        rt_payload = await self.get_refresh_token_payload(user_id=user_id, roles=roles, session_id=session_id)
+        at_payload = await self.get_access_token_payload(user_id=user_id, roles=roles, permissions=permissions)
+        rt_payload = await self.get_refresh_token_payload(
+            user_id=user_id, roles=roles, session_id=session_id, permissions=permissions
+        )
         access_token = await self.generate_token(at_payload, token_expire=self.access_token_expire)
         refresh_token = await self.generate_token(rt_payload, token_expire=self.refresh_token_expire)
 
@@ -48,13 +68,33 @@ class JWTService:
         return encoded_jwt
 
     @staticmethod
-    async def get_access_token_payload(user_id: str, roles: list = None) -> AccessTokenData:
-        return AccessTokenData(user_id=user_id, iat=datetime.utcnow(), exp=datetime.utcnow(), roles=roles)
+    async def get_access_token_payload(
+        user_id: str, roles: list = None, permissions: list[str] | None = None
+    ) -> AccessTokenData:
+        """
+        Access token payload with permissions resolved at issue time, so services do not ask for them
+        """
+        permissions = compact_permissions(get_default_permissions() + (permissions or []))
+        return AccessTokenData(
+            user_id=user_id,
+            iat=datetime.utcnow(),
+            exp=datetime.utcnow(),
+            roles=roles,
+            permissions=permissions,
+            permissions_digest=get_permissions_digest(permissions),
+        )
 
     @staticmethod
-    async def get_refresh_token_payload(user_id: str, session_id: uuid, roles: list = None) -> RefreshTokenData:
+    async def get_refresh_token_payload(
+        user_id: str, session_id: uuid, roles: list = None, permissions: list[str] | None = None
+    ) -> RefreshTokenData:
         return RefreshTokenData(
-            user_id=user_id, iat=datetime.utcnow(), exp=datetime.utcnow(), roles=roles, session_id=session_id
+            user_id=user_id,
+            iat=datetime.utcnow(),
+            exp=datetime.utcnow(),
+            roles=roles,
+            permissions=permissions,
+            session_id=session_id,
         )
 
     async def verify_token(self, token: str) -> dict:
@@ -0,0 +1,105 @@
+from typing import Dict, Iterable, List
+
+import logging
+
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
+
+from redis.exceptions import RedisError
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import select
+
+from core.settings import settings
+from db import redis_db
+from models.db_entity import LoginHistory
+from services.login_history_partitions import add_months, current_month, history_window_start
+
+# Saves a count with the moment it was taken, unless a count is already known
+STORE_IF_ABSENT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'count', ARGV[1], 'as_of', ARGV[2])
+redis.call('EXPIREAT', KEYS[1], ARGV[3])
+return 1
+"""
+
+# Bumps a known count by the logins written after it was taken, the earlier ones are already in it
+INCREMENT_AFTER = """
+local as_of = redis.call('HGET', KEYS[1], 'as_of')
+if not as_of then
+    return nil
+end
+local count = 0
+for _, timestamp in ipairs(ARGV) do
+    if tonumber(timestamp) > tonumber(as_of) then
+        count = count + 1
+    end
+end
+return redis.call('HINCRBY', KEYS[1], 'count', count)
+"""
+
+
+class LoginHistoryCounter:
+    """
+    Number of login history records of each user, kept in Redis and bumped by login writes.
+
+    A count remembers when it was taken, so logins it already includes are not added twice.
+    The count is approximate: a login taken before the count but written after it is missed.
+    It is recounted after count_ttl and when the retention window moves to the next month.
+    """
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"{settings.login_history.count_prefix}{user_id}"
+
+    @staticmethod
+    def _expires_at(now: datetime) -> int:
+        window_moves_at = datetime.combine(add_months(current_month(), 1), datetime.min.time(), UTC)
+        return int(min(now + timedelta(seconds=settings.login_history.count_ttl), window_moves_at).timestamp())
+
+    @staticmethod
+    async def _query_count(db: AsyncSession, user_id: str, as_of: datetime) -> int:
+        statement = select(func.count()).where(
+            LoginHistory.user_id == user_id,
+            LoginHistory.timestamp >= history_window_start(),
+            LoginHistory.timestamp <= as_of.replace(tzinfo=None),
+        )
+        return (await db.execute(statement=statement)).scalar_one()
+
+    async def get(self, db: AsyncSession, user_id: str) -> int:
+        try:
+            cached_count = await redis_db.redis.hget(self._key(user_id), "count")
+            if cached_count is not None:
+                return int(cached_count)
+        except RedisError as excp:
+            logging.exception("Unable to read login history count: %s", excp)
+
+        as_of = datetime.now(UTC)
+        count = await self._query_count(db, user_id, as_of)
+        try:
+            await redis_db.redis.eval(
+                STORE_IF_ABSENT, 1, self._key(user_id), count, as_of.timestamp(), self._expires_at(as_of)
+            )
+        except RedisError as excp:
+            logging.exception("Unable to save login history count: %s", excp)
+        return count
+
+    async def increment(self, events: Iterable[dict]) -> None:
+        """
+        Bumps counters of users by their just written login events.
+        """
+        timestamps: Dict[str, List[float]] = defaultdict(list)
+        for event in events:
+            timestamps[str(event["user_id"])].append(event["timestamp"].timestamp())
+        try:
+            async with redis_db.redis.pipeline(transaction=False) as pipe:
+                for user_id, user_timestamps in timestamps.items():
+                    pipe.eval(INCREMENT_AFTER, 1, self._key(user_id), *user_timestamps)
+                await pipe.execute()
+        except RedisError as excp:
+            logging.exception("Unable to increment login history counts: %s", excp)
+
+
+login_history_counter = LoginHistoryCounter()
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import re
+
+from datetime import UTC, date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from core.settings import settings
+from db import postgres
+
+PARENT_TABLE = "login_history_parent"
+PARTITION_NAME = re.compile(r"^login_history_y(\d{4})m(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    return datetime.now(UTC).date().replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f"login_history_y{month.year:04d}m{month.month:02d}"
+
+
+def history_window_start() -> datetime:
+    """
+    Oldest login time still kept in attached partitions, history queries do not look further.
+    """
+    month = add_months(current_month(), -settings.login_history.retention_months)
+    return datetime(month.year, month.month, 1)
+
+
+class LoginHistoryPartitions:
+    """
+    Keeps monthly RANGE partitions of login history: creates upcoming months in advance
+    and detaches months older than the retention period, so they can be archived or dropped.
+    """
+
+    @staticmethod
+    async def create_partitions(conn: AsyncConnection) -> None:
+        month = current_month()
+        for offset in range(settings.login_history.partition_months_ahead + 1):
+            start = add_months(month, offset)
+            await conn.execute(
+                text(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS "{partition_name(start)}"
+                    PARTITION OF {PARENT_TABLE}
+                    FOR VALUES FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')"""
+                )
+            )
+
+    @staticmethod
+    async def get_partitions(conn: AsyncConnection) -> dict[str, date]:
+        result = await conn.execute(
+            text(
+                """
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+                JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+                WHERE parent.relname = :parent"""
+            ),
+            {"parent": PARENT_TABLE},
+        )
+        partitions = {}
+        for (name,) in result:
+            match = PARTITION_NAME.match(name)
+            if match:
+                partitions[name] = date(int(match[1]), int(match[2]), 1)
+        return partitions
+
+    async def expire_partitions(self, conn: AsyncConnection) -> list[str]:
+        """
+        Detaches partitions older than the retention period, drops them when configured.
+        """
+        oldest_kept = add_months(current_month(), -settings.login_history.retention_months)
+        expired = [name for name, month in (await self.get_partitions(conn)).items() if month < oldest_kept]
+        for name in expired:
+            await conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"'))
+            if settings.login_history.drop_expired:
+                await conn.execute(text(f'DROP TABLE "{name}"'))
+        return expired
+
+    async def maintain(self) -> None:
+        """
+        Runs one maintenance pass, other workers skip it while the advisory lock is held.
+        """
+        async with postgres.engine.begin() as conn:
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": settings.login_history.lock_id}
+            )
+            if not locked:
+                return
+            await self.create_partitions(conn)
+            expired = await self.expire_partitions(conn)
+        if expired:
+            logging.info("Detached expired login history partitions: %s", expired)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.maintain()
+            except Exception as excp:
+                logging.exception("Unable to maintain login history partitions: %s", excp)
+            await asyncio.sleep(settings.login_history.maintenance_interval_hours * 60 * 60)
+
+
+login_history_partitions = LoginHistoryPartitions()
+
+
+if __name__ == "__main__":
+
+    async def main() -> None:
+        postgres.engine = postgres.create_engine()
+        try:
+            await login_history_partitions.maintain()
+        finally:
+            await postgres.engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from datetime import UTC, datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from core.settings import settings
+from db import postgres
+from models.db_entity import LoginHistory
+from services.login_history_counter import login_history_counter
+
+# The database is unavailable for a while, the batch is written again once it is back
+TRANSIENT_ERRORS = (InterfaceError, OperationalError, OSError)
+
+
+class LoginHistoryWriter:
+    """
+    Collects login events in a bounded queue and writes them by multi-row inserts in the background.
+
+    A full queue makes logins wait for the writer instead of growing without limit.
+    A batch is retried while the database is unavailable, so no event is lost to an outage.
+    Events still queued on shutdown are written before the worker stops.
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue[dict | None] | None = None
+        self.task: asyncio.Task | None = None
+        self.stopping = False
+
+    @property
+    def started(self) -> bool:
+        return self.task is not None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.queue = asyncio.Queue(maxsize=settings.login_history.queue_size)
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Writes queued events and stops the writer.
+        """
+        if self.task is not None:
+            self.stopping = True
+            await self.queue.put(None)
+            await self.task
+            self.task = None
+            self.queue = None
+            self.stopping = False
+
+    @staticmethod
+    def build_event(user_id: str, ip_address: str, location: str, user_agent: str) -> dict:
+        return {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "timestamp": datetime.now(UTC),
+            "ip_address": ip_address,
+            "location": location,
+            "user_agent": user_agent,
+        }
+
+    async def record(self, event: dict) -> None:
+        await self.queue.put(event)
+
+    async def _collect(self, first: dict) -> tuple[list[dict], bool]:
+        """
+        Collects a batch after its first event, returns the batch and whether the writer is stopping.
+        """
+        batch = [first]
+        deadline = time.monotonic() + settings.login_history.flush_interval_ms / 1000
+        while len(batch) < settings.login_history.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(self.queue.get(), timeout)
+            except TimeoutError:
+                break
+            if event is None:
+                return batch, True
+            batch.append(event)
+        return batch, False
+
+    @staticmethod
+    async def _insert(batch: list[dict]) -> None:
+        async with postgres.async_session() as session:
+            await session.execute(insert(LoginHistory).values(batch))
+            await session.commit()
+
+    async def _write(self, batch: list[dict]) -> None:
+        """
+        Writes a batch, retrying it with backoff while the database is unavailable.
+        On shutdown a batch is given up after settings.backoff.max_tries attempts.
+        """
+        attempt = 0
+        while True:
+            try:
+                await self._insert(batch)
+                break
+            except TRANSIENT_ERRORS as excp:
+                attempt += 1
+                if self.stopping and attempt >= settings.backoff.max_tries:
+                    logging.exception("DB. Unable to save %s login history records: %s", len(batch), excp)
+                    return
+                delay = min(settings.login_history.retry_backoff_max, 0.1 * 2 ** min(attempt, 16))
+                logging.warning("DB. Unable to save login history, retry in %.1fs: %s", delay, excp)
+                await asyncio.sleep(delay)
+            except Exception as excp:
+                logging.exception("DB. Unable to save %s login history records: %s", len(batch), excp)
+                return
+        await login_history_counter.increment(batch)
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self.queue.get()
+            if first is None:
+                break
+            batch, stopping = await self._collect(first)
+            await self._write(batch)
+
+
+login_history_writer = LoginHistoryWriter()
@@ -1,5 +1,11 @@
+import base64
+import json
+import uuid
+
+from datetime import datetime
 from enum import Enum
 
+from fastapi import HTTPException, status
 from fastapi.param_functions import Query
 from pydantic import BaseModel
 
@@ -13,6 +19,7 @@ class Pagination(BaseModel):
     per_page: int
     page: int
     order: SortEnum
+    cursor: str | None = None
 
     def get_offset(self):
         if self.page == 1:
@@ -23,9 +30,26 @@ class Pagination(BaseModel):
         return offset
 
 
+def encode_cursor(timestamp: datetime, id: str) -> str:
+    """
+    Opaque cursor pointing at the last returned row of a page ordered by (timestamp, id).
+    """
+    value = json.dumps({"timestamp": timestamp.isoformat(), "id": str(id)})
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(value["timestamp"]), uuid.UUID(value["id"])
+    except (ValueError, TypeError, KeyError) as excp:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor") from excp
+
+
 def pagination_params(
     page: int = Query(ge=1, required=False, default=1, le=100),
     per_page: int = Query(ge=1, le=100, required=False, default=50),
     order: SortEnum = SortEnum.DESC,
+    cursor: str | None = Query(required=False, default=None, description="next_cursor of the previous page"),
 ):
-    return Pagination(per_page=per_page, page=page, order=order.value)
+    return Pagination(per_page=per_page, page=page, order=order.value, cursor=cursor)
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from core.settings import settings
+
+
+class HashingMetrics:
+    """
+    Counters and latency of password hashing in the current worker.
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.completed += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self, pending: int) -> dict:
+        return {
+            "pending": pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 3) if self.completed else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3),
+        }
+
+
+class PasswordHasher:
+    """
+    Runs password hashing in a bounded pool, so a login burst does not block the event loop.
+    Hashing requests above the queue limit are rejected with 503 instead of piling up.
+    """
+
+    def __init__(self):
+        self.executor: Executor | None = None
+        self.pending = 0
+        self.metrics = HashingMetrics()
+
+    def start(self) -> None:
+        if self.executor is None:
+            if settings.password_hashing.executor == "process":
+                self.executor = ProcessPoolExecutor(max_workers=settings.password_hashing.workers)
+            else:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=settings.password_hashing.workers, thread_name_prefix="password-hashing"
+                )
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def _run(self, func, *args):
+        if self.pending >= settings.password_hashing.max_pending:
+            self.metrics.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.start()
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.metrics.observe(time.perf_counter() - started)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(generate_password_hash, password)
+
+    async def check(self, hashed_password: str, password: str) -> bool:
+        return await self._run(check_password_hash, hashed_password, password)
+
+    def get_stats(self) -> dict:
+        return self.metrics.as_dict(self.pending)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,93 @@
+import json
+import logging
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import select
+
+from core.settings import settings
+from db import redis_db
+from models.db_entity import User
+from services.helper import LocalLRU
+
+
+class Principal:
+    """
+    Compact record of an authenticated user, enough for access checks of endpoints.
+    """
+
+    __slots__ = ("id", "email", "is_active", "is_superuser")
+
+    def __init__(self, id: str, email: str, is_active: bool, is_superuser: bool):
+        self.id = id
+        self.email = email
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"id": self.id, "email": self.email, "is_active": self.is_active, "is_superuser": self.is_superuser}
+        )
+
+    @classmethod
+    def from_json(cls, value: str | bytes) -> "Principal":
+        return cls(**json.loads(value))
+
+
+class PrincipalCache:
+    """
+    Principals by user id in memory of the worker for a few seconds and in Redis behind it.
+    """
+
+    def __init__(self):
+        self.local = LocalLRU(maxsize=settings.principal_cache.local_maxsize, ttl=settings.principal_cache.local_ttl)
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"{settings.principal_cache.prefix}{user_id}"
+
+    @staticmethod
+    async def _query_principal(db: AsyncSession, user_id: str) -> Principal | None:
+        statement = select(User.id, User.email, User.is_active, User.is_superuser).where(User.id == user_id)
+        row = (await db.execute(statement=statement)).one_or_none()
+        if row is None:
+            return None
+        return Principal(id=str(row.id), email=row.email, is_active=row.is_active, is_superuser=row.is_superuser)
+
+    async def get(self, db: AsyncSession, user_id: str) -> Principal | None:
+        user_id = str(user_id)
+        principal = self.local.get(user_id)
+        if principal is not None:
+            return principal
+
+        try:
+            cached_principal = await redis_db.redis.get(self._key(user_id))
+            if cached_principal is not None:
+                principal = Principal.from_json(cached_principal)
+        except RedisError as excp:
+            logging.exception("Unable to read principal cache: %s", excp)
+
+        if principal is None:
+            principal = await self._query_principal(db, user_id)
+            if principal is None:
+                return None
+            try:
+                await redis_db.redis.setex(self._key(user_id), settings.principal_cache.ttl, principal.to_json())
+            except RedisError as excp:
+                logging.exception("Unable to save principal cache: %s", excp)
+
+        self.local.set(user_id, principal)
+        return principal
+
+    async def invalidate(self, user_id: str) -> None:
+        """
+        Drops the principal after its email, password or roles change.
+        """
+        self.local.delete(str(user_id))
+        try:
+            await redis_db.redis.delete(self._key(str(user_id)))
+        except RedisError as excp:
+            logging.exception("Unable to invalidate principal of user %s: %s", user_id, excp)
+
+
+principal_cache = PrincipalCache()
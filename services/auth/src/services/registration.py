@@ -8,6 +8,7 @@ from db.redis_db import get_redis
 from models.db_entity import User
 from models.oauth import SocialNetworks
 from schemas.model import SNUserRegisteredResp, SNUserRegistrationReq, UserRegisteredResp, UserRegistrationReq
+from services.password_hashing import password_hasher
 
 from .helper import AsyncCache
 
@@ -31,7 +32,7 @@ class RegistrationService:
         return user is not None
 
     async def add_user(self, db: AsyncSession, user_info: UserRegistrationReq) -> UserRegisteredResp:
-        user = User(email=user_info.email, hashed_password=user_info.password)
+        user = User(email=user_info.email, hashed_password=await password_hasher.hash(user_info.password))
         db.add(user)
         await db.commit()
         await db.refresh(user)
@@ -0,0 +1,142 @@
+from typing import Dict, List
+
+import json
+import logging
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import select
+
+from core.settings import settings
+from db import redis_db
+from models.db_entity import Role, UserRole
+from schemas.model import UserRoles
+from services.helper import LocalLRU
+
+# Caches roles read at a version of the user, unless the user was invalidated while they were loaded
+STORE_IF_VERSION = """
+if (redis.call('GET', KEYS[2]) or '') == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return nil
+"""
+
+
+class UserRoleCache:
+    """
+    Roles of users cached in Redis and, for a few seconds, in memory of the worker.
+
+    Redis keys include a generation, deleting a role moves all users to a new generation at once.
+    Invalidating a user bumps its version, roles loaded from the DB before that are not cached.
+    Other workers may serve roles from memory for up to the local TTL after a change.
+    """
+
+    def __init__(self):
+        self.local = LocalLRU(maxsize=settings.role_cache.local_maxsize, ttl=settings.role_cache.local_ttl)
+
+    @staticmethod
+    async def _get_generation() -> int:
+        return int(await redis_db.redis.get(settings.role_cache.user_roles_generation_key) or 0)
+
+    @staticmethod
+    def _key(generation: int, user_id: str) -> str:
+        return f"{settings.role_cache.user_roles_prefix}{generation}:{user_id}"
+
+    @staticmethod
+    def _version_key(user_id: str) -> str:
+        return f"{settings.role_cache.user_roles_prefix}version:{user_id}"
+
+    @staticmethod
+    async def _query_roles(db: AsyncSession, user_ids: List[str]) -> Dict[str, list[dict]]:
+        """
+        Searching for roles of all the users in one query.
+        """
+        statement = select(UserRole.user_id, Role.id, Role.name).where(
+            UserRole.user_id.in_(user_ids), UserRole.role_id == Role.id
+        )
+        statement_result = await db.execute(statement=statement)
+        roles: Dict[str, list[dict]] = {user_id: [] for user_id in user_ids}
+        for user_id, role_id, role_name in statement_result:
+            roles[str(user_id)].append({"id": str(role_id), "name": role_name})
+        return roles
+
+    async def get_roles_for_users(self, db: AsyncSession, user_ids: List[str]) -> Dict[str, List[UserRoles]]:
+        """
+        Resolves roles of many users with at most one Redis round trip and one query.
+        """
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        roles: Dict[str, list[dict]] = {}
+        for user_id in user_ids:
+            cached_roles = self.local.get(user_id)
+            if cached_roles is not None:
+                roles[user_id] = cached_roles
+
+        missing = [user_id for user_id in user_ids if user_id not in roles]
+        generation = None
+        versions: Dict[str, str] = {}
+        if missing:
+            try:
+                current_generation = await self._get_generation()
+                cached = await redis_db.redis.mget(
+                    [self._key(current_generation, user_id) for user_id in missing]
+                    + [self._version_key(user_id) for user_id in missing]
+                )
+                versions = {user_id: version or "" for user_id, version in zip(missing, cached[len(missing) :])}
+                generation = current_generation
+                for user_id, cached_roles in zip(missing, cached):
+                    if cached_roles is not None:
+                        roles[user_id] = json.loads(cached_roles)
+                        self.local.set(user_id, roles[user_id])
+            except RedisError as excp:
+                logging.exception("Unable to read user roles cache: %s", excp)
+
+        missing = [user_id for user_id in missing if user_id not in roles]
+        if missing:
+            loaded = await self._query_roles(db, missing)
+            roles.update(loaded)
+            for user_id, user_roles in loaded.items():
+                self.local.set(user_id, user_roles)
+            if generation is not None:
+                try:
+                    async with redis_db.redis.pipeline(transaction=False) as pipe:
+                        for user_id, user_roles in loaded.items():
+                            pipe.eval(
+                                STORE_IF_VERSION,
+                                2,
+                                self._key(generation, user_id),
+                                self._version_key(user_id),
+                                versions[user_id],
+                                json.dumps(user_roles),
+                                settings.role_cache.ttl,
+                            )
+                        await pipe.execute()
+                except RedisError as excp:
+                    logging.exception("Unable to save user roles cache: %s", excp)
+
+        return {user_id: [UserRoles(**role) for role in roles[user_id]] for user_id in user_ids}
+
+    async def get_user_roles(self, db: AsyncSession, user_id: str) -> List[UserRoles]:
+        return (await self.get_roles_for_users(db, [user_id]))[str(user_id)]
+
+    async def invalidate_user(self, user_id: str) -> None:
+        self.local.delete(str(user_id))
+        try:
+            generation = await self._get_generation()
+            async with redis_db.redis.pipeline(transaction=True) as pipe:
+                # outlives roles cached at the previous version, so they can't be stored anymore
+                pipe.incr(self._version_key(str(user_id)))
+                pipe.expire(self._version_key(str(user_id)), settings.role_cache.ttl * 2)
+                pipe.delete(self._key(generation, str(user_id)))
+                await pipe.execute()
+        except RedisError as excp:
+            logging.exception("Unable to invalidate roles of user %s: %s", user_id, excp)
+
+    async def invalidate_all(self) -> None:
+        self.local.clear()
+        try:
+            await redis_db.redis.incr(settings.role_cache.user_roles_generation_key)
+        except RedisError as excp:
+            logging.exception("Unable to invalidate user roles cache: %s", excp)
+
+
+user_role_cache = UserRoleCache()
@@ -0,0 +1,31 @@
+import pytest
+
+from services.jwt_token import compact_permissions, get_permissions_digest
+
+
+@pytest.mark.parametrize(
+    "permissions, expected",
+    [
+        ([], []),
+        (["/api/v1/users", "/api/v1/users"], ["/api/v1/users"]),
+        (["/api/v1/users/roles", "/api/v1/users"], ["/api/v1/users"]),
+        (["/api/v1/users", "/api/v1/roles", "/api/v1/users/me"], ["/api/v1/roles", "/api/v1/users"]),
+        (["/api/v1/", "/api/v1/users", "/billing"], ["/api/v1/", "/billing"]),
+        (["/api/v1/user", "/api/v1/users"], ["/api/v1/user"]),
+    ],
+)
+def test_compact_permissions(permissions, expected):
+    """
+    Permissions are sorted, unique and a permission covered by a shorter prefix is dropped.
+    """
+    assert compact_permissions(permissions) == expected
+
+
+def test_compacted_permissions_have_one_digest():
+    """
+    Equal permission sets issue the same digest whatever their order and duplicates are.
+    """
+    first = compact_permissions(["/api/v1/users", "/billing", "/api/v1/users/me"])
+    second = compact_permissions(["/billing", "/api/v1/users", "/billing"])
+
+    assert get_permissions_digest(first) == get_permissions_digest(second)
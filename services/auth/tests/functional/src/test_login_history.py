@@ -0,0 +1,169 @@
+import uuid
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from fastapi import HTTPException
+from sqlalchemy import asc, desc
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from db import redis_db
+from services.base import BaseService
+from services import login_history_writer as writer_module
+from services.login_history_counter import LoginHistoryCounter
+from services.login_history_writer import LoginHistoryWriter
+from services.pagination import decode_cursor, encode_cursor
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+USER_ID = str(uuid.uuid4())
+
+
+class FakeResult:
+    def __init__(self, rows: list, count: int):
+        self.rows = rows
+        self.count = count
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def scalar_one(self):
+        return self.count
+
+
+class FakeSession:
+    """
+    Returns the given rows and count, records the SQL of the executed statements.
+    """
+
+    def __init__(self, rows: list | None = None, count: int = 0):
+        self.rows = rows or []
+        self.count = count
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return FakeResult(self.rows, self.count)
+
+
+@pytest.fixture(name="counter")
+def counter(monkeypatch, redis_client):
+    monkeypatch.setattr(redis_db, "redis", redis_client)
+    return LoginHistoryCounter()
+
+
+async def test_cursor_round_trip():
+    timestamp = datetime(2026, 10, 18, 12, 30, 15, 123456)
+    login_id = uuid.uuid4()
+
+    assert decode_cursor(encode_cursor(timestamp, str(login_id))) == (timestamp, login_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2026, 10, 18), "not-a-uuid")])
+async def test_decode_cursor_rejects_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.parametrize("order, operator", [(desc, "<"), (asc, ">")])
+async def test_cursor_continues_after_last_row(order, operator):
+    db = FakeSession(count=1)
+    cursor = encode_cursor(datetime(2026, 10, 18), str(uuid.uuid4()))
+
+    await BaseService.get_user_login_history(
+        db, USER_ID, limit=10, order=order, cursor=cursor, since=datetime(2026, 10, 1, tzinfo=UTC)
+    )
+
+    statement = db.statements[0]
+    direction = "DESC" if order is desc else "ASC"
+    assert f"(login_history_parent.timestamp, login_history_parent.id) {operator} (" in statement
+    assert f"ORDER BY login_history_parent.timestamp {direction}, login_history_parent.id {direction}" in statement
+    assert "OFFSET" not in statement
+
+
+async def test_next_cursor_points_at_last_row_of_page():
+    rows = [
+        type("Login", (), {"id": uuid.uuid4(), "timestamp": datetime(2026, 10, 18) - timedelta(minutes=minute)})()
+        for minute in range(3)
+    ]
+    db = FakeSession(rows=rows, count=3)
+
+    history, count, next_cursor = await BaseService.get_user_login_history(
+        db, USER_ID, limit=2, since=datetime(2026, 10, 1, tzinfo=UTC)
+    )
+
+    assert len(history) == 2
+    assert count == 3
+    assert decode_cursor(next_cursor) == (rows[1].timestamp, rows[1].id)
+
+
+async def test_counter_does_not_count_logins_twice(counter):
+    db = FakeSession(count=5)
+    before = datetime.now(UTC) - timedelta(seconds=1)
+
+    assert await counter.get(db, USER_ID) == 5
+    await counter.increment([{"user_id": USER_ID, "timestamp": before}])
+    assert await counter.get(db, USER_ID) == 5
+
+    await counter.increment([{"user_id": USER_ID, "timestamp": datetime.now(UTC)}] * 2)
+    assert await counter.get(db, USER_ID) == 7
+    assert len(db.statements) == 1
+
+
+async def test_counter_expires_with_retention_window(counter, redis_client):
+    await counter.get(FakeSession(count=1), USER_ID)
+    next_month = (datetime.now(UTC).replace(day=1) + timedelta(days=32)).replace(day=1)
+
+    ttl = await redis_client.ttl(counter._key(USER_ID))
+    assert 0 < ttl <= (next_month - datetime.now(UTC)).total_seconds() + 1
+
+
+@pytest.fixture(name="writes")
+def writes(monkeypatch):
+    """
+    Fails inserts with the queued errors, records the written and the counted batches.
+    """
+    failures, written, counted = [], [], []
+
+    async def insert(batch):
+        if failures:
+            raise failures.pop(0)
+        written.append(batch)
+
+    async def increment(batch):
+        counted.append(batch)
+
+    async def sleep(delay):
+        pass
+
+    monkeypatch.setattr(LoginHistoryWriter, "_insert", staticmethod(insert))
+    monkeypatch.setattr(writer_module.login_history_counter, "increment", increment)
+    monkeypatch.setattr(writer_module.asyncio, "sleep", sleep)
+    return failures, written, counted
+
+
+async def test_writer_retries_batch_while_database_is_unavailable(writes):
+    failures, written, counted = writes
+    failures.extend([OperationalError("INSERT", {}, ConnectionError())] * 3)
+    batch = [LoginHistoryWriter.build_event(USER_ID, "127.0.0.1", "", "test")]
+
+    await LoginHistoryWriter()._write(batch)
+
+    assert written == counted == [batch]
+    assert failures == []
+
+
+async def test_writer_does_not_count_batch_it_failed_to_write(writes):
+    failures, written, counted = writes
+    failures.append(IntegrityError("INSERT", {}, ValueError()))
+
+    await LoginHistoryWriter()._write([LoginHistoryWriter.build_event(USER_ID, "127.0.0.1", "", "test")])
+
+    assert written == counted == []
@@ -0,0 +1,120 @@
+import uuid
+
+import pytest
+
+from db import redis_db
+from services import helper
+from services.helper import LocalLRU
+from services.role_cache import UserRoleCache
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+USER_ID = str(uuid.uuid4())
+OTHER_USER_ID = str(uuid.uuid4())
+ROLE = (str(uuid.uuid4()), "role.reader")
+
+
+class FakeSession:
+    """
+    Answers the roles query from a dict and records the users asked for.
+    """
+
+    def __init__(self, roles: dict, on_query=None):
+        self.roles = roles
+        self.on_query = on_query
+        self.queried = []
+
+    async def execute(self, statement):
+        user_ids = next(value for value in statement.compile().params.values() if isinstance(value, list))
+        self.queried.append(sorted(user_ids))
+        if self.on_query is not None:
+            await self.on_query()
+        return [(user_id, role_id, name) for user_id in user_ids for role_id, name in self.roles.get(user_id, [])]
+
+
+@pytest.fixture(name="clock")
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(helper.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture(name="role_cache")
+def role_cache(monkeypatch, redis_client):
+    monkeypatch.setattr(redis_db, "redis", redis_client)
+    return UserRoleCache()
+
+
+async def test_local_lru_expires_entries(clock):
+    cache = LocalLRU(maxsize=10, ttl=5)
+    cache.set("key", "value")
+    clock[0] += 4.9
+    assert cache.get("key") == "value"
+    clock[0] += 0.1
+    assert cache.get("key") is None
+
+
+async def test_local_lru_evicts_least_recently_used(clock):
+    cache = LocalLRU(maxsize=2, ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    cache.delete("a")
+    cache.clear()
+    assert cache.get("c") is None
+
+
+async def test_get_roles_for_users_queries_missing_users_once(role_cache):
+    db = FakeSession({USER_ID: [ROLE]})
+
+    roles = await role_cache.get_roles_for_users(db, [USER_ID, OTHER_USER_ID, USER_ID])
+
+    assert list(roles) == [USER_ID, OTHER_USER_ID]
+    assert [(str(role.id), role.name) for role in roles[USER_ID]] == [ROLE]
+    assert roles[OTHER_USER_ID] == []
+    assert db.queried == [sorted([USER_ID, OTHER_USER_ID])]
+
+    await role_cache.get_roles_for_users(db, [USER_ID, OTHER_USER_ID])
+    assert len(db.queried) == 1
+
+
+async def test_get_roles_for_users_reads_roles_cached_in_redis(role_cache):
+    await role_cache.get_roles_for_users(FakeSession({USER_ID: [ROLE]}), [USER_ID])
+    db = FakeSession({})
+
+    roles = await UserRoleCache().get_roles_for_users(db, [USER_ID])
+
+    assert [(str(role.id), role.name) for role in roles[USER_ID]] == [ROLE]
+    assert db.queried == []
+
+
+async def test_get_roles_for_users_reloads_invalidated_users(role_cache):
+    await role_cache.get_roles_for_users(FakeSession({USER_ID: [ROLE]}), [USER_ID, OTHER_USER_ID])
+    db = FakeSession({})
+
+    await role_cache.invalidate_user(USER_ID)
+    roles = await role_cache.get_roles_for_users(db, [USER_ID, OTHER_USER_ID])
+    assert roles[USER_ID] == []
+    assert db.queried == [[USER_ID]]
+
+    await role_cache.invalidate_all()
+    await role_cache.get_roles_for_users(db, [USER_ID, OTHER_USER_ID])
+    assert db.queried[-1] == sorted([USER_ID, OTHER_USER_ID])
+
+
+async def test_get_roles_for_users_does_not_cache_roles_invalidated_while_loading(role_cache):
+    async def revoke_role():
+        await role_cache.invalidate_user(USER_ID)
+
+    await role_cache.get_roles_for_users(FakeSession({USER_ID: [ROLE]}, on_query=revoke_role), [USER_ID])
+    db = FakeSession({})
+
+    roles = await UserRoleCache().get_roles_for_users(db, [USER_ID])
+
+    assert roles[USER_ID] == []
+    assert db.queried == [[USER_ID]]
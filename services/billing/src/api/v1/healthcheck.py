@@ -2,9 +2,25 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
+from core.settings import settings
+from db import get_redis
+from db.postgres import pg_manager
+
 router = APIRouter()
 
 
 @router.get("/check")
 async def health_check() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/check/pg_pool")
+async def pg_pool_stats() -> dict[str, int | float]:
+    stats: dict[str, int | float] = pg_manager.get_pool_stats()
+    return stats
+
+
+@router.get("/check/renewal_lag")
+async def renewal_lag() -> dict[str, float]:
+    lags = await get_redis().hgetall(settings.renewal.lag_key)
+    return {str(shard): float(lag) for shard, lag in lags.items()}
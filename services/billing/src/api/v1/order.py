@@ -2,11 +2,11 @@ from __future__ import annotations
 
 from typing import Annotated, Any, cast
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
 from starlette import status
 
 from schemas.entity import OrderSchema
-from services import OrderService, get_order_service
+from services import IdempotencyReservation, OrderService, get_idempotency_reservation, get_order_service
 
 router = APIRouter()
 
@@ -16,20 +16,34 @@ router = APIRouter()
     status_code=status.HTTP_201_CREATED,
     summary="Create a new order",
     description="""
-        The server validates the provided **idempotency key** by checking it against the cache to prevent duplicate operations.
-        If the key is already present in the cache, the request is rejected with a **409 Conflict** error, ensuring that the same
-        operation is not processed multiple times.
+        The server atomically reserves the provided **idempotency key** to prevent duplicate operations.
+        A retry with an already used key gets the id of the order created by the first request, while a concurrent
+        duplicate of a request still in progress is rejected with a **409 Conflict** error.
+        Durations of the creation stages are reported in the **Server-Timing** header.
     """,
 )
 async def create_order(
-    request: Request, schema_in: OrderSchema, service: Annotated[OrderService, Depends(get_order_service)]
+    request: Request,
+    response: Response,
+    schema_in: OrderSchema,
+    service: Annotated[OrderService, Depends(get_order_service)],
 ) -> Any:
     schema_in.user_id = request.state.user_id
-    order = await service.create_order(schema_in)
+    timings: dict[str, float] = {}
+    order = await service.create_order(schema_in, timings)
+    response.headers["Server-Timing"] = ", ".join(f"{stage};dur={took * 1000:.1f}" for stage, took in timings.items())
     return order.id
 
 
 @router.post("/refund_order")
-async def refund_order(order_service: Annotated[OrderService, Depends(get_order_service)], order_id: str) -> bool:
+async def refund_order(
+    order_service: Annotated[OrderService, Depends(get_order_service)],
+    reservation: Annotated[IdempotencyReservation | None, Depends(get_idempotency_reservation)],
+    order_id: str,
+) -> bool:
+    if reservation is not None and reservation.result is not None:
+        return bool(reservation.result == str(True))
     status = await order_service.refund_order(order_id)
+    if reservation is not None:
+        reservation.result = str(status)
     return cast(bool, status)
@@ -1,31 +1,29 @@
-from typing import Annotated
-
-from functools import lru_cache
-
-from fastapi import Depends
-
 from broker.kafka_admin import KafkaAdminManager, initialize_kafka_topics
-from broker.kafka_producer import KafkaMessageSender, KafkaTransactionManager
-from core.settings import KafkaSettings, get_settings
+from broker.kafka_producer import (
+    KafkaBatchingSender,
+    KafkaMessageSender,
+    KafkaTransactionManager,
+    kafka_batching_sender,
+    kafka_transaction_manager,
+)
 
 __all__ = [
     "initialize_kafka_topics",
     "KafkaAdminManager",
     "KafkaTransactionManager",
     "KafkaMessageSender",
+    "KafkaBatchingSender",
+    "kafka_transaction_manager",
+    "kafka_batching_sender",
     "get_kafka_sender",
 ]
 
 
-@lru_cache
-def get_kafka_producer(settings: Annotated[KafkaSettings, Depends(get_settings)]) -> KafkaTransactionManager:
-    """Provide Kafka transactional producer."""
-    return KafkaTransactionManager(settings.kafka)
+def get_kafka_producer() -> KafkaTransactionManager:
+    """Provide pool of Kafka transactional producers started by the lifespan."""
+    return kafka_transaction_manager
 
 
-@lru_cache
-def get_kafka_sender(
-    connection_manager: Annotated[KafkaTransactionManager, Depends(get_kafka_producer)],
-) -> KafkaMessageSender:
-    """Provide Kafka message sender."""
-    return KafkaMessageSender(connection_manager)
+def get_kafka_sender() -> KafkaMessageSender:
+    """Provide Kafka message sender coalescing messages of concurrent requests."""
+    return kafka_batching_sender
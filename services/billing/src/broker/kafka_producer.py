@@ -1,5 +1,9 @@
+from __future__ import annotations
+
 from typing import AsyncGenerator
 
+import asyncio
+
 from contextlib import asynccontextmanager
 
 import backoff
@@ -14,31 +18,66 @@ logger = get_logger(__name__)
 
 
 class KafkaTransactionManager:
-    """Manager for Kafka transactional producer with unique transactions."""
+    """Pool of started transactional producers with stable transactional ids."""
 
-    __slots__ = ("kafka_settings",)
+    __slots__ = ("kafka_settings", "_idle", "_producers")
 
     def __init__(self, kafka_settings: KafkaSettings) -> None:
         self.kafka_settings = kafka_settings
+        self._idle: asyncio.Queue[str] = asyncio.Queue()
+        self._producers: dict[str, AIOKafkaProducer] = {}
 
-    @asynccontextmanager
-    async def get_producer(self) -> AsyncGenerator[AIOKafkaProducer, None]:
-        """Context manager for Kafka producer with unique transaction ID."""
-        transaction_id = self.kafka_settings.generate_transaction_id()
+    async def _start_producer(self, transactional_id: str) -> None:
         producer = AIOKafkaProducer(
             enable_idempotence=self.kafka_settings.enable_idempotence,
             retry_backoff_ms=self.kafka_settings.retry_backoff_ms,
             acks=self.kafka_settings.acks,
             bootstrap_servers=self.kafka_settings.bootstrap_servers,
-            transactional_id=transaction_id,
+            transactional_id=transactional_id,
+            compression_type=self.kafka_settings.compression_type,
         )
         await producer.start()
-        logger.info("Kafka Producer started with idempotence: %s", transaction_id)
+        self._producers[transactional_id] = producer
+        logger.info("Kafka Producer started with transactional ID: %s", transactional_id)
+
+    async def initialize(self) -> None:
+        """Start the pool, producers keep their transactional ids across worker restarts."""
+        if not self._producers:
+            for number in range(self.kafka_settings.producer_pool_size):
+                transactional_id = self.kafka_settings.get_transactional_id(number)
+                await self._start_producer(transactional_id)
+                self._idle.put_nowait(transactional_id)
+
+    async def close(self) -> None:
+        """Stop all producers of the pool."""
+        for transactional_id, producer in self._producers.items():
+            await producer.stop()
+            logger.info("Kafka Producer stopped with transactional ID: %s", transactional_id)
+        self._producers.clear()
+        self._idle = asyncio.Queue()
+
+    @asynccontextmanager
+    async def get_producer(self) -> AsyncGenerator[AIOKafkaProducer, None]:
+        """Borrow an idle producer, a failed one is restarted before it returns to the pool."""
+        transactional_id = await self._idle.get()
         try:
-            yield producer
+            yield self._producers[transactional_id]
+        except BaseException:
+            await self._restart_producer(transactional_id)
+            raise
         finally:
-            await producer.stop()
-            logger.info("Kafka Producer stopped with transactional ID: %s", transaction_id)
+            self._idle.put_nowait(transactional_id)
+
+    async def _restart_producer(self, transactional_id: str) -> None:
+        """Replace a producer, the new one fences the old one's pending transaction."""
+        try:
+            await self._producers[transactional_id].stop()
+            await self._start_producer(transactional_id)
+        except Exception:
+            logger.exception("Kafka Producer with transactional ID %s can't be restarted", transactional_id)
+
+
+kafka_transaction_manager = KafkaTransactionManager(settings.kafka)
 
 
 class KafkaMessageSender:
@@ -58,3 +97,90 @@ class KafkaMessageSender:
             async with producer.transaction():
                 await producer.send_and_wait(**message.model_dump())
                 logger.info("Message sent to topic %s with idempotency key: %s", message.topic, message.key)
+
+
+class KafkaBatchingSender(KafkaMessageSender):
+    """Coalesces concurrently sent messages into shared producer transactions.
+
+    Senders wait until the transaction with their message is committed, so delivery guarantees
+    are those of :class:`KafkaMessageSender` without a broker round trip per message.
+    """
+
+    __slots__ = ("_queue", "_flushers")
+
+    def __init__(self, connection_manager: KafkaTransactionManager) -> None:
+        super().__init__(connection_manager)
+        self._queue: asyncio.Queue[tuple[MessageIn, asyncio.Future[None]] | None] = asyncio.Queue()
+        self._flushers: list[asyncio.Task[None]] = []
+
+    async def initialize(self) -> None:
+        """Start one flusher per pooled producer."""
+        if not self._flushers:
+            flushers = self.connection_manager.kafka_settings.producer_pool_size
+            self._flushers = [asyncio.create_task(self._flush_forever()) for _ in range(flushers)]
+
+    async def close(self) -> None:
+        """Let flushers send queued messages and stop."""
+        for _ in self._flushers:
+            await self._queue.put(None)
+        await asyncio.gather(*self._flushers, return_exceptions=True)
+        self._flushers = []
+
+    async def send_message(self, message: MessageIn) -> None:
+        """Queue message and wait for the commit of its transaction."""
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, future))
+        await future
+
+    async def _collect(self) -> tuple[list[tuple[MessageIn, asyncio.Future[None]]], bool]:
+        """Wait for a message, then for more during the linger time, returns batch and stop flag."""
+        item = await self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.connection_manager.kafka_settings.send_linger_ms / 1000
+        while len(batch) < self.connection_manager.kafka_settings.send_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    @backoff.on_exception(
+        backoff.expo, Exception, max_time=settings.backoff.max_time, max_tries=settings.backoff.max_tries
+    )
+    async def _send_batch(self, messages: list[MessageIn]) -> None:
+        async with self.connection_manager.get_producer() as producer:
+            async with producer.transaction():
+                deliveries = [await producer.send(**message.model_dump()) for message in messages]
+                await asyncio.gather(*deliveries)
+        logger.info("Batch of %s messages sent in one transaction", len(messages))
+
+    async def _flush(self, batch: list[tuple[MessageIn, asyncio.Future[None]]]) -> None:
+        try:
+            await self._send_batch([message for message, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _flush_forever(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect()
+            if batch:
+                await self._flush(batch)
+
+
+kafka_batching_sender = KafkaBatchingSender(kafka_transaction_manager)
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
-import hashlib
-import time
+import socket
 
 from pathlib import Path
 
@@ -49,6 +48,11 @@ class PGSettings(DefaultSettings):
     dsn_local: str = Field(...)
     async_schema: str = Field(...)
     dsn_pg: str = Field(...)
+    pool_size: int = Field(default=10, description="Number of persistent connections kept in the pool")
+    max_overflow: int = Field(default=20, description="Connections allowed above pool_size under load")
+    pool_timeout: float = Field(default=30.0, description="Seconds to wait for a free connection")
+    pool_recycle: int = Field(default=1800, description="Seconds after which a connection is recycled")
+    pool_pre_ping: bool = Field(default=True, description="Test connections for liveness on checkout")
 
     model_config = SettingsConfigDict(env_prefix="POSTGRES_")
 
@@ -79,6 +83,8 @@ class JWTSettings(DefaultSettings):
     authjwt_access_token_expires: int = Field(...)
     authjwt_access_cookie_key: str = Field(...)
     authjwt_refresh_cookie_key: str = Field(...)
+    token_cache_maxsize: int = Field(default=10_000, description="Max amount of verified tokens kept in memory")
+    token_cache_ttl: int = Field(default=60, description="Seconds a verified token is trusted without decoding")
 
     model_config = SettingsConfigDict(env_prefix="JWT_")
 
@@ -94,14 +100,26 @@ class KafkaSettings(DefaultSettings):
     bootstrap_servers: str = Field(...)
     group_id: str = Field(...)
     retry_backoff_ms: int = Field(...)
+    batch_max_records: int = Field(default=500, description="Amount of messages processed in one DB transaction")
+    batch_timeout_ms: int = Field(default=1000, description="Time to wait for a batch to fill up")
+    partition_queue_size: int = Field(
+        default=4, description="Batches buffered for a partition worker before the partition is paused"
+    )
+    db_retry_backoff_base: float = Field(default=0.5, description="First delay before retrying a batch, seconds")
+    db_retry_backoff_max: float = Field(default=30.0, description="Upper bound of a batch retry delay, seconds")
+    producer_pool_size: int = Field(default=4, description="Started transactional producers per app worker")
+    transactional_id_prefix: str = Field(default="billing", description="Prefix of producer transactional ids")
+    worker_slot: int = Field(default=0, description="Slot of the app worker, set by gunicorn_conf.py")
+    compression_type: str | None = Field(default="lz4", description="Producer compression: gzip, lz4, zstd or none")
+    send_batch_size: int = Field(default=200, description="Messages coalesced into one producer transaction")
+    send_linger_ms: int = Field(default=10, description="Time to wait for more messages to coalesce")
     config_path: Path = Path(__file__).resolve().parent.parent / "broker" / "topics" / "config.json"
 
     model_config = SettingsConfigDict(env_prefix="KAFKA_")
 
-    def generate_transaction_id(self) -> str:
-        """Generate unique transaction id."""
-        unique_string = f"{self.bootstrap_servers}{time.time()}"
-        return hashlib.sha256(unique_string.encode("utf-8")).hexdigest()
+    def get_transactional_id(self, producer_number: int) -> str:
+        """Stable transactional id of a producer of the current host and worker slot."""
+        return f"{self.transactional_id_prefix}-{socket.gethostname()}-{self.worker_slot}-{producer_number}"
 
 
 class RedisSettings(DefaultSettings):
@@ -112,6 +130,7 @@ class RedisSettings(DefaultSettings):
     backoff_max_tries: int = Field(...)
     record_expiration_time: int = Field(...)
     prefix: str = "idempotency_key:"
+    reservation_ttl_ms: int = Field(default=30_000, description="Lifetime of an in-progress idempotency reservation")
 
     model_config = SettingsConfigDict(env_prefix="REDIS_")
 
@@ -120,10 +139,71 @@ class PaymentSettings(DefaultSettings):
     account_id: str = Field(...)
     secret_key: str = Field(...)
     return_url: str = Field(...)
+    api_url: str = Field(default="https://api.yookassa.ru/v3/", description="Base url of the provider API")
 
     model_config = SettingsConfigDict(env_prefix="YOOKASSA_")
 
 
+class HttpClientSettings(DefaultSettings):
+    """Class to store settings of pooled outgoing HTTP clients."""
+
+    timeout: float = Field(default=10.0, description="Read/write/pool timeout, seconds")
+    connect_timeout: float = Field(default=5.0, description="Connect timeout, seconds")
+    max_connections: int = Field(default=100, description="Upper bound of open connections")
+    max_keepalive_connections: int = Field(default=20, description="Amount of idle connections kept open")
+    keepalive_expiry: float = Field(default=30.0, description="Idle connection lifetime, seconds")
+    http2: bool = Field(default=True, description="Multiplex requests over HTTP/2 connections")
+
+    model_config = SettingsConfigDict(env_prefix="HTTP_CLIENT_")
+
+
+class PaymentDispatchSettings(DefaultSettings):
+    """Class to store settings of automatic payments dispatching."""
+
+    concurrency: int = Field(default=50, description="Amount of payment requests in flight")
+    rate_limit: float = Field(default=100.0, description="Payment requests per second")
+    burst: int = Field(default=50, description="Requests allowed at once above the rate")
+    max_retries: int = Field(default=3, description="Retries of throttled or failed requests")
+    backoff_base: float = Field(default=0.5, description="Base of exponential backoff, seconds")
+    backoff_max: float = Field(default=30.0, description="Upper bound of a single retry delay, seconds")
+
+    model_config = SettingsConfigDict(env_prefix="PAYMENT_DISPATCH_")
+
+
+class RenewalSettings(DefaultSettings):
+    """Class to store subscription renewal settings."""
+
+    chunk_size: int = Field(default=1000, description="Amount of orders created by one multi-row insert")
+    batch_size: int = Field(default=5000, description="Amount of due user products read by one keyset page")
+    shards: int = Field(default=8, description="Amount of user partitions renewed independently")
+    lock_namespace: int = Field(default=7311, description="First key of the shard advisory locks")
+    min_sleep: float = Field(default=1.0, description="Minimal pause between scheduler passes, seconds")
+    max_sleep: float = Field(default=60.0, description="Maximal pause between scheduler passes, seconds")
+    lag_key: str = Field(default="renewal_shard_lag", description="Redis hash with renewal lag of every shard")
+
+    model_config = SettingsConfigDict(env_prefix="RENEWAL_")
+
+
+class CacheSettings(DefaultSettings):
+    """Class to store settings of the two-tier payment link cache."""
+
+    local_maxsize: int = Field(default=10_000, description="Payment links kept in memory of a worker")
+    local_ttl: float = Field(default=5.0, description="Seconds a link is served from memory")
+    payment_link_prefix: str = Field(default="payment_link:", description="Prefix of payment link keys in Redis")
+    invalidation_channel: str = Field(default="payment_link_invalidation", description="Redis channel of evictions")
+
+    model_config = SettingsConfigDict(env_prefix="CACHE_")
+
+
+class CatalogSettings(DefaultSettings):
+    """Class to store settings of the in-process product catalog."""
+
+    version_key: str = Field(default="product_catalog_version", description="Redis key of the catalog version")
+    channel: str = Field(default="product_catalog_changes", description="Redis channel of catalog versions")
+
+    model_config = SettingsConfigDict(env_prefix="CATALOG_")
+
+
 class Settings:
     debug: bool = False
     app: AppSettings = AppSettings()
@@ -133,8 +213,13 @@ class Settings:
     redis: RedisSettings = RedisSettings()
     backoff: BackoffSettings = BackoffSettings()
     payment: PaymentSettings = PaymentSettings()
+    http_client: HttpClientSettings = HttpClientSettings()
+    payment_dispatch: PaymentDispatchSettings = PaymentDispatchSettings()
     jwt: JWTSettings = JWTSettings()
     kafka: KafkaSettings = KafkaSettings()
+    renewal: RenewalSettings = RenewalSettings()
+    cache: CacheSettings = CacheSettings()
+    catalog: CatalogSettings = CatalogSettings()
 
 
 settings = Settings()
@@ -1,33 +1,160 @@
-from typing import AsyncGenerator
+from __future__ import annotations
 
+from typing import Any, AsyncGenerator
+
+import time
+
+from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from core.logger import get_logger
+from core.settings import settings
 
 logger = get_logger(__name__)
 
 
-async def get_pg_session() -> AsyncGenerator[AsyncSession, None]:
-    """Get a session for database operations."""
+class PoolMetrics:
+    """Counters of the connection pool usage."""
+
+    __slots__ = ("checkouts", "checkins", "connects", "invalidations", "wait_count", "wait_total", "wait_max")
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe_wait(self, seconds: float) -> None:
+        self.wait_count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def as_dict(self) -> dict[str, int | float]:
+        return {
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "wait_avg_ms": round(self.wait_total / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that measures how long callers wait for a connection."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - started)
+
+    def recreate(self) -> MeteredQueuePool:
+        pool: MeteredQueuePool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class PostgresManager:
+    __slots__ = ("engine", "session_maker", "metrics")
+
+    def __init__(self) -> None:
+        self.engine: AsyncEngine | None = None
+        self.session_maker: async_sessionmaker[AsyncSession] | None = None
+        self.metrics = PoolMetrics()
 
-    from core.settings import settings
+    async def initialize(self) -> None:
+        """Initialize process-wide engine and session factory."""
+        if self.engine is None:
+            self.engine = create_async_engine(
+                url=settings.pg.dsn,
+                echo=settings.debug,
+                poolclass=MeteredQueuePool,
+                pool_size=settings.pg.pool_size,
+                max_overflow=settings.pg.max_overflow,
+                pool_timeout=settings.pg.pool_timeout,
+                pool_recycle=settings.pg.pool_recycle,
+                pool_pre_ping=settings.pg.pool_pre_ping,
+            )
+            self.engine.sync_engine.pool.metrics = self.metrics
+            self._register_pool_events(self.engine)
+            self.session_maker = async_sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+            logger.info("Postgres engine has been initialized")
 
-    engine = create_async_engine(url=settings.pg.dsn, echo=settings.debug, future=True)
-    async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async def close(self) -> None:
+        """Dispose engine and close all pooled connections."""
+        if self.engine:
+            await self.engine.dispose()
+            self.engine = None
+            self.session_maker = None
+            logger.info("Postgres engine has been disposed")
 
-    async with async_session() as session:
+    def get_engine(self) -> AsyncEngine:
+        """Get the shared engine, e.g. for connections used outside of sessions."""
+        if self.engine is None:
+            raise SQLAlchemyError("Postgres engine has not been initialized.")
+        return self.engine
+
+    def get_session_maker(self) -> async_sessionmaker[AsyncSession]:
+        """Get session factory bound to the shared engine."""
+        if self.session_maker is None:
+            raise SQLAlchemyError("Postgres engine has not been initialized.")
+        return self.session_maker
+
+    def get_pool_stats(self) -> dict[str, int | float]:
+        """Get current pool state merged with accumulated metrics."""
+        if self.engine is None:
+            return {}
+        pool = self.engine.sync_engine.pool
+        stats: dict[str, int | float] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        }
+        stats.update(self.metrics.as_dict())
+        return stats
+
+    def _register_pool_events(self, engine: AsyncEngine) -> None:
+        metrics = self.metrics
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def on_connect(*_: Any) -> None:
+            metrics.connects += 1
+
+        @event.listens_for(engine.sync_engine, "checkout")
+        def on_checkout(*_: Any) -> None:
+            metrics.checkouts += 1
+
+        @event.listens_for(engine.sync_engine, "checkin")
+        def on_checkin(*_: Any) -> None:
+            metrics.checkins += 1
+
+        @event.listens_for(engine.sync_engine, "invalidate")
+        def on_invalidate(*_: Any) -> None:
+            metrics.invalidations += 1
+
+
+pg_manager = PostgresManager()
+
+
+async def get_pg_session() -> AsyncGenerator[AsyncSession, None]:
+    """Get a session for database operations."""
+    async with pg_manager.get_session_maker()() as session:
         yield session
 
 
 async def get_pg_session_for_sequence() -> AsyncGenerator[AsyncSession, None]:
     """Get a session for sequence of database operations."""
-    from core.settings import settings
-
-    engine = create_async_engine(url=settings.pg.dsn, echo=settings.debug, future=True)
-    async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
-
-    async with async_session() as session:
+    async with pg_manager.get_session_maker()() as session:
         async with session.begin():
             try:
                 yield session
@@ -1,3 +1,6 @@
+from typing import Any
+
+import itertools
 import os
 
 bind = f"0.0.0.0:{os.getenv('APP_PORT')}"
@@ -8,3 +11,13 @@ worker_class = "uvicorn.workers.UvicornWorker"
 loglevel = "debug"
 accesslog = "-"
 errorlog = "-"
+
+
+def pre_fork(server: Any, worker: Any) -> None:
+    # a restarted worker takes the slot of the dead one and keeps its Kafka transactional ids
+    used_slots = {getattr(alive, "slot", None) for alive in server.WORKERS.values()}
+    worker.slot = next(slot for slot in itertools.count() if slot not in used_slots)
+
+
+def post_fork(_: Any, worker: Any) -> None:
+    os.environ["KAFKA_WORKER_SLOT"] = str(worker.slot)
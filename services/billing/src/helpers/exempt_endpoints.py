@@ -9,6 +9,8 @@ class ExemptEndpoints(BaseModel):
     """List of exempt endpoints."""
 
     healthcheck: str = "/check"
+    pg_pool_stats: str = "/check/pg_pool"
+    renewal_lag: str = "/check/renewal_lag"
     docs: str = config.api.docs_url.split(config.api.version)[-1]
     openai: str = config.api.openapi_url.split(config.api.version)[-1]
     results_callback: str = config.api.results_callback_url.split(config.api.version)[-1]
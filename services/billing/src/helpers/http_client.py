@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from base64 import b64encode
+from functools import lru_cache
+
+import httpx
+
+from core.logger import get_logger
+from core.settings import settings
+
+logger = get_logger(__name__)
+
+
+def create_http_client(base_url: str = "") -> httpx.AsyncClient:
+    """Create a long-lived pooled client, it must be closed by its owner."""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=settings.http_client.http2,
+        timeout=httpx.Timeout(settings.http_client.timeout, connect=settings.http_client.connect_timeout),
+        limits=httpx.Limits(
+            max_connections=settings.http_client.max_connections,
+            max_keepalive_connections=settings.http_client.max_keepalive_connections,
+            keepalive_expiry=settings.http_client.keepalive_expiry,
+        ),
+    )
+
+
+class HttpClientManager:
+    __slots__ = ("client",)
+
+    def __init__(self) -> None:
+        self.client: httpx.AsyncClient | None = None
+
+    async def initialize(self) -> None:
+        """Initialize process-wide pooled HTTP client."""
+        if self.client is None:
+            self.client = create_http_client()
+            logger.info("HTTP client has been initialized")
+
+    async def close(self) -> None:
+        """Close HTTP client and its pooled connections."""
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+            logger.info("HTTP client has been closed")
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Get shared HTTP client."""
+        if self.client is None:
+            raise httpx.TransportError("HTTP client has not been initialized.")
+        return self.client
+
+
+http_client_manager = HttpClientManager()
+
+
+@lru_cache(maxsize=1)
+def get_yookassa_auth_header() -> str:
+    """Basic auth header of the shop account, computed once per process."""
+    credentials = f"{settings.payment.account_id}:{settings.payment.secret_key}".encode()
+    return f"Basic {b64encode(credentials).decode('utf-8')}"
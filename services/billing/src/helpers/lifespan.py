@@ -8,11 +8,29 @@ from fastapi import FastAPI
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncGenerator[None, None]:
     from broker import initialize_kafka_topics
+    from broker import kafka_batching_sender as kafka_sender
+    from broker import kafka_transaction_manager as kafka
+    from db.postgres import pg_manager as pg
     from db.redis import redis_manager as redis
+    from helpers.http_client import http_client_manager as http_client
+    from services.payment_link_cache import payment_link_cache
+    from services.product_catalog import product_catalog
 
     try:
+        await pg.initialize()
         await redis.initialize()
+        await payment_link_cache.initialize()
+        await product_catalog.initialize()
+        await http_client.initialize()
         await initialize_kafka_topics()
+        await kafka.initialize()
+        await kafka_sender.initialize()
         yield
     finally:
+        await kafka_sender.close()
+        await kafka.close()
+        await http_client.close()
+        await product_catalog.close()
+        await payment_link_cache.close()
         await redis.close()
+        await pg.close()
@@ -2,16 +2,21 @@ from __future__ import annotations
 
 from typing import Any, Callable
 
+import hashlib
+import time
+
 from async_fastapi_jwt_auth import AuthJWT
 from async_fastapi_jwt_auth.exceptions import AuthJWTException
 from fastapi import FastAPI, status
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from core.logger import get_logger
 from core.settings import settings as config
+from helpers.cache import TTLCache
 from helpers.exempt_endpoints import get_exempt_endpoints
+from helpers.permissions import get_permission_trie
 
 logger = get_logger(__name__)
 
@@ -19,78 +24,111 @@ logger = get_logger(__name__)
 class AuthService:
     """Handle authentication-related operations."""
 
-    def __init__(self, authjwt: AuthJWT):
-        self.authjwt = authjwt
+    __slots__ = ("token_cache",)
+
+    def __init__(self, token_cache: TTLCache[str, dict[str, Any]]):
+        self.token_cache = token_cache
+
+    @staticmethod
+    def _token_digest(request: Request) -> str | None:
+        token = request.cookies.get(config.jwt.authjwt_access_cookie_key)
+        if not token:
+            return None
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
     async def authenticate(self, request: Request) -> Any:
-        self.authjwt._request = request  # noqa: SLF001
-        await self.authjwt.jwt_required()
-        return await self.authjwt.get_raw_jwt()
+        digest = self._token_digest(request)
+        if digest is not None:
+            claims = self.token_cache.get(digest)
+            if claims is not None:
+                return claims
+
+        authjwt = AuthJWT(req=request)
+        await authjwt.jwt_required()
+        claims = await authjwt.get_raw_jwt()
+
+        if digest is not None and claims:
+            expires_in = float(claims.get("exp", 0)) - time.time()
+            self.token_cache.set(digest, claims, ttl=expires_in)
+        return claims
 
 
 class PermissionChecker:
     """Handle permission checking for the user."""
 
+    __slots__ = ("exempt_endpoints",)
+
     def __init__(self, exempt_endpoints_provider: Callable[[], list[str]]):
-        self.exempt_endpoints_provider = exempt_endpoints_provider
+        self.exempt_endpoints = frozenset(exempt_endpoints_provider())
 
     def is_exempt(self, path: str) -> bool:
-        exempt_endpoints = self.exempt_endpoints_provider()
-        return path in exempt_endpoints
+        return path in self.exempt_endpoints
 
     @staticmethod
-    def has_permission(user_permissions: list[str], path: str) -> bool:
-        return any(path.startswith(permission) for permission in user_permissions)
+    def has_permission(user_permissions: list[str], path: str, digest: str | None = None) -> bool:
+        matched: bool = get_permission_trie(user_permissions, digest).matches(path)
+        return matched
 
 
-class PermissionMiddleware(BaseHTTPMiddleware):
+class PermissionMiddleware:
     """Checks user permissions before processing a request."""
 
-    def __init__(self, app: FastAPI, auth_service: AuthService, permission_checker: PermissionChecker):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, auth_service: AuthService, permission_checker: PermissionChecker):
+        self.app = app
         self.auth_service = auth_service
         self.permission_checker = permission_checker
         logger.info("Permission middleware initialized")
 
-    async def dispatch(self, request: Request, call_next: Callable[..., Any]) -> JSONResponse:
-        path = request.url.path.split(config.api.version)[-1]
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        logger.info("Checking permissions for path: %s", path)
+        path = scope["path"].split(config.api.version)[-1]
+        logger.debug("Checking permissions for path: %s", path)
 
         if not self.permission_checker.is_exempt(path):
-            try:
-                current_user = await self.auth_service.authenticate(request)
-                logger.debug("Current user: %s", current_user)
+            response = await self.check_request(Request(scope), path)
+            if response is not None:
+                await response(scope, receive, send)
+                return
 
-                if not current_user:
-                    return JSONResponse(
-                        status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid credentials."}
-                    )
-
-                if config.jwt.permissions_enabled:
-                    current_user_permissions = current_user.get("permissions", [])
-                    if not self.permission_checker.has_permission(current_user_permissions, path):
-                        return JSONResponse(
-                            status_code=status.HTTP_403_FORBIDDEN, content={"detail": "Insufficient rights."}
-                        )
+        await self.app(scope, receive, send)
 
-                request.state.user_id = current_user.get("user_id")
+    async def check_request(self, request: Request, path: str) -> JSONResponse | None:
+        """Authenticate request, store user id in its state, return error response if any."""
+        try:
+            current_user = await self.auth_service.authenticate(request)
+            logger.debug("Current user: %s", current_user)
 
-            except AuthJWTException as e:
-                logger.exception("AuthJWTException: JWT token Encoding Error", exc_info=e)
+            if not current_user:
                 return JSONResponse(
-                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                    content={"detail": "Session expired. Login again."},
+                    status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid credentials."}
                 )
 
-        return await call_next(request)
+            if config.jwt.permissions_enabled:
+                current_user_permissions = current_user.get("permissions", [])
+                digest = current_user.get("permissions_digest")
+                if not self.permission_checker.has_permission(current_user_permissions, path, digest):
+                    return JSONResponse(
+                        status_code=status.HTTP_403_FORBIDDEN, content={"detail": "Insufficient rights."}
+                    )
+
+            request.state.user_id = current_user.get("user_id")
 
-    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
-        await super().__call__(scope, receive, send)
+        except AuthJWTException as e:
+            logger.exception("AuthJWTException: JWT token Encoding Error", exc_info=e)
+            return JSONResponse(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": "Session expired. Login again."}
+            )
+        return None
 
 
 # Dependency Injection setup
 def setup_middleware(app: FastAPI) -> None:
-    auth_service = AuthService(AuthJWT())
+    token_cache: TTLCache[str, dict[str, Any]] = TTLCache(
+        maxsize=config.jwt.token_cache_maxsize, ttl=config.jwt.token_cache_ttl
+    )
+    auth_service = AuthService(token_cache)
     permission_checker = PermissionChecker(get_exempt_endpoints)
     app.add_middleware(PermissionMiddleware, auth_service=auth_service, permission_checker=permission_checker)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import math
+
+from functools import lru_cache
+
+from helpers.cache import TTLCache
+
+_END = ""
+
+
+class PermissionTrie:
+    """Prefix tree of permitted path prefixes."""
+
+    __slots__ = ("_root",)
+
+    def __init__(self, prefixes: Iterable[str]) -> None:
+        self._root: dict[str, Any] = {}
+        for prefix in prefixes:
+            node = self._root
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[_END] = True
+
+    def matches(self, path: str) -> bool:
+        """Check that some permission is a prefix of <path>, O(len(path))."""
+        node = self._root
+        if _END in node:
+            return True
+        for char in path:
+            child: dict[str, Any] | None = node.get(char)
+            if child is None:
+                return False
+            if _END in child:
+                return True
+            node = child
+        return False
+
+
+@lru_cache(maxsize=1024)
+def compile_permissions(permissions: tuple[str, ...]) -> PermissionTrie:
+    """Build (once per distinct permission set) a trie of permissions."""
+    return PermissionTrie(permissions)
+
+
+# Tries of permission sets by the digest auth puts next to them in the access token
+_tries_by_digest: TTLCache[str, PermissionTrie] = TTLCache(maxsize=1024, ttl=math.inf)
+
+
+def get_permission_trie(permissions: list[str], digest: str | None = None) -> PermissionTrie:
+    """Get trie of <permissions>, a signed <digest> saves hashing the whole set per request."""
+    if digest is None:
+        return compile_permissions(tuple(permissions))
+    trie: PermissionTrie | None = _tries_by_digest.get(digest)
+    if trie is None:
+        trie = PermissionTrie(permissions)
+        _tries_by_digest.set(digest, trie)
+    return trie
@@ -2,7 +2,7 @@ import datetime
 
 from uuid import uuid4
 
-from sqlalchemy import UUID, Boolean, Column, DateTime, Enum, Float, ForeignKey, String
+from sqlalchemy import UUID, Boolean, Column, DateTime, Enum, Float, ForeignKey, Index, String, text
 from sqlalchemy.orm import DeclarativeBase, relationship
 
 from core.constraints import Currency, OrderStatus, TransactionStatus, TransactionType
@@ -63,6 +63,10 @@ class UserProduct(UUIDMixin, DatesMixin, Base):
 
     product = relationship("Product", back_populates="user_products")
 
+    __table_args__ = (
+        Index("ix_user_product_renewal_due", "active_till", "id", postgresql_where=text("renewal_enabled")),
+    )
+
 
 class Order(UUIDMixin, DatesMixin, Base):
     __tablename__ = "order"
@@ -1,16 +1,22 @@
-from typing import Annotated
+from typing import Annotated, AsyncGenerator
 
 from functools import lru_cache
 
-from fastapi import Depends
+from fastapi import Depends, Header, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from db import get_redis
 from db.postgres import get_pg_session
+from db.redis import TRedis
+from helpers.http_client import http_client_manager
 from interfaces.repositories import RedisRepositoryProtocol
 from repositories import get_redis_repo
 from services.entity import EntityService
+from services.idempotency import IdempotencyReservation, IdempotencyService, request_fingerprint
 from services.order_service import OrderService
 from services.payment import PaymentService
+from services.payment_link_cache import PaymentLinkCache, payment_link_cache
+from services.product_catalog import ProductCatalog, product_catalog
 from services.product_service import ProductService
 
 __all__: list[str] = [
@@ -20,13 +26,54 @@ __all__: list[str] = [
     "get_entity_service",
     "ProductService",
     "get_product_service",
+    "IdempotencyService",
+    "IdempotencyReservation",
+    "get_idempotency_service",
+    "get_idempotency_reservation",
+    "PaymentLinkCache",
+    "get_payment_link_cache",
+    "ProductCatalog",
+    "get_product_catalog",
 ]
 
 
 @lru_cache
 def get_payment_service() -> PaymentService:
     """Provider of PaymentService."""
-    return PaymentService()
+    return PaymentService(http_client_manager.get_client())
+
+
+@lru_cache
+def get_idempotency_service(redis: Annotated[TRedis, Depends(get_redis)]) -> IdempotencyService:
+    """Provider of IdempotencyService."""
+    return IdempotencyService(redis)
+
+
+async def get_idempotency_reservation(
+    request: Request,
+    idempotency_service: Annotated[IdempotencyService, Depends(get_idempotency_service)],
+    idempotency_key: Annotated[str | None, Header()] = None,
+) -> AsyncGenerator[IdempotencyReservation | None, None]:
+    """Guards a POST endpoint by its path, arguments and Idempotency-Key.
+
+    The endpoint sets the result of the reservation.
+    """
+    if idempotency_key is None:
+        yield None
+        return
+    fingerprint = request_fingerprint(request.query_params.multi_items(), await request.body())
+    async with idempotency_service.guard(f"{request.url.path}:{fingerprint}", idempotency_key) as reservation:
+        yield reservation
+
+
+def get_payment_link_cache() -> PaymentLinkCache:
+    """Provider of PaymentLinkCache started by the lifespan."""
+    return payment_link_cache
+
+
+def get_product_catalog() -> ProductCatalog:
+    """Provider of ProductCatalog loaded by the lifespan."""
+    return product_catalog
 
 
 @lru_cache
@@ -34,15 +81,21 @@ def get_order_service(
     db: Annotated[AsyncSession, Depends(get_pg_session)],
     redis_repo: Annotated[RedisRepositoryProtocol, Depends(get_redis_repo)],
     payment_service: Annotated[PaymentService, Depends(get_payment_service)],
+    idempotency_service: Annotated[IdempotencyService, Depends(get_idempotency_service)],
+    links: Annotated[PaymentLinkCache, Depends(get_payment_link_cache)],
+    catalog: Annotated[ProductCatalog, Depends(get_product_catalog)],
 ) -> OrderService:
     """Provider of OrderService."""
-    return OrderService(db, redis_repo, payment_service)
+    return OrderService(db, redis_repo, payment_service, idempotency_service, links, catalog)
 
 
 @lru_cache
-def get_entity_service(db: Annotated[AsyncSession, Depends(get_pg_session)]) -> EntityService:
+def get_entity_service(
+    db: Annotated[AsyncSession, Depends(get_pg_session)],
+    catalog: Annotated[ProductCatalog, Depends(get_product_catalog)],
+) -> EntityService:
     """Provider of EntityService."""
-    return EntityService(db)
+    return EntityService(db, catalog)
 
 
 @lru_cache
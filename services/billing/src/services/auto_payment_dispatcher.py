@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from typing import Any
+
+import asyncio
+import bisect
+import random
+import time
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from urllib.parse import urljoin
+
+import httpx
+
+from sqlalchemy import Row
+
+from core.logger import get_logger
+from core.settings import settings
+from helpers.http_client import get_yookassa_auth_header
+
+logger = get_logger(__name__)
+
+RETRYABLE_STATUSES = frozenset(
+    {
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.INTERNAL_SERVER_ERROR,
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    }
+)
+
+
+class TokenBucket:
+    """Limits average request rate to <rate> per second allowing bursts of <capacity>."""
+
+    __slots__ = ("rate", "capacity", "_tokens", "_updated_at", "_lock")
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, bounds are in seconds."""
+
+    __slots__ = ("bounds", "counts", "total", "max")
+
+    BOUNDS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, bounds: tuple[float, ...] = BOUNDS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the <q> quantile, 0 while nothing is observed."""
+        count = sum(self.counts)
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def as_dict(self) -> dict[str, float]:
+        count = sum(self.counts)
+        return {
+            "count": count,
+            "avg": self.total / count if count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class AutoPaymentDispatcher:
+    """Sends automatic payments through a shared client with bounded concurrency and retries."""
+
+    __slots__ = ("_client", "_semaphore", "_bucket", "_max_retries", "_backoff_base", "_backoff_max")
+
+    def __init__(self, client: httpx.AsyncClient) -> None:
+        self._client = client
+        self._semaphore = asyncio.Semaphore(settings.payment_dispatch.concurrency)
+        self._bucket = TokenBucket(settings.payment_dispatch.rate_limit, settings.payment_dispatch.burst)
+        self._max_retries: int = settings.payment_dispatch.max_retries
+        self._backoff_base: float = settings.payment_dispatch.backoff_base
+        self._backoff_max: float = settings.payment_dispatch.backoff_max
+
+    def _retry_delay(self, attempt: int, response: httpx.Response | None) -> float:
+        """Delay requested by Retry-After or exponential backoff with full jitter."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self._backoff_max)
+            except ValueError:
+                try:
+                    delay: float = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                    return min(max(delay, 0.0), self._backoff_max)
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self._backoff_max, self._backoff_base * 2**attempt))  # noqa: S311
+
+    async def _send(self, payment_method_id: str, transaction: Row[Any], histogram: LatencyHistogram) -> bool:
+        headers = {
+            "Authorization": get_yookassa_auth_header(),
+            # the key is stable across retries so the provider never charges twice
+            "Idempotence-Key": str(transaction.id),
+            "Content-Type": "application/json",
+        }
+        payment_data = {
+            "amount": {"value": str(transaction.amount), "currency": str(transaction.currency.value).upper()},
+            "payment_method_id": payment_method_id,
+            "capture": True,
+            "description": f"Automatic payment for order №{transaction.order_id}",
+            "metadata": {"transaction_id": str(transaction.id)},
+        }
+        url = urljoin(settings.payment.api_url, "payments")
+        for attempt in range(self._max_retries + 1):
+            response: httpx.Response | None = None
+            async with self._semaphore:
+                await self._bucket.acquire()
+                started = time.perf_counter()
+                try:
+                    response = await self._client.post(url, headers=headers, json=payment_data)
+                except httpx.TransportError as e:
+                    logger.warning("Payment of transaction %s failed: %s", transaction.id, e)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+            if response is not None:
+                if response.status_code == HTTPStatus.OK:
+                    return True
+                if response.status_code not in RETRYABLE_STATUSES:
+                    logger.error("Payment of transaction %s rejected: %s", transaction.id, response.status_code)
+                    return False
+            if attempt < self._max_retries:
+                await asyncio.sleep(self._retry_delay(attempt, response))
+        logger.error("Payment of transaction %s failed after %s attempts", transaction.id, self._max_retries + 1)
+        return False
+
+    async def dispatch(self, payments: list[tuple[str, Row[Any]]]) -> list[bool]:
+        """Sends (payment method id, transaction) pairs, returns success flag of every payment."""
+        histogram = LatencyHistogram()
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._send(payment_method_id, transaction, histogram) for payment_method_id, transaction in payments)
+        )
+        logger.info(
+            "Dispatched %s payments (%s ok) in %.3fs, latency %s",
+            len(payments),
+            sum(results),
+            time.perf_counter() - started,
+            histogram.as_dict(),
+        )
+        return list(results)
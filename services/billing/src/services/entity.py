@@ -8,19 +8,22 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from core.logger import get_logger
 from models.pg import Product, Transaction, UserProduct
 from schemas.entity import ProductSchema, TransactionSchema
+from services.product_catalog import ProductCatalog
 
 logger = get_logger(__name__)
 
 
 class EntityService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, product_catalog: ProductCatalog):
         self._db = db
+        self._catalog = product_catalog
 
     async def create_product(self, product_schema: ProductSchema) -> ProductSchema:
         new_product = Product(**product_schema.model_dump())
         self._db.add(new_product)
         await self._db.commit()
         await self._db.refresh(new_product)
+        await self._catalog.notify_changed()
         return new_product.id
 
     async def create_transaction(self, transaction_schema: TransactionSchema) -> str:
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import AsyncGenerator
+
+import hashlib
+
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
+
+from fastapi import HTTPException
+from starlette import status
+
+from core.logger import get_logger
+from core.settings import settings
+from db.redis import TRedis
+
+logger = get_logger(__name__)
+
+IN_PROGRESS = "__in_progress__"
+
+# Reserves the key or returns its current value in one round trip
+RESERVE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return false
+end
+return redis.call('GET', KEYS[1])
+"""
+
+
+def request_fingerprint(query_params: list[tuple[str, str]], body: bytes) -> str:
+    """Digest of the arguments of a request, a key reused with other arguments is reserved anew."""
+    digest = hashlib.sha256(urlencode(sorted(query_params)).encode())
+    digest.update(b"\n")
+    digest.update(body)
+    return digest.hexdigest()[:32]
+
+
+class IdempotencyReservation:
+    """Outcome of a reservation: a cached result to replay or a slot for the new result.
+
+    <key> is the Redis name of the reservation, namespaced by the guarded operation.
+    """
+
+    __slots__ = ("key", "replayed", "result")
+
+    def __init__(self, key: str, cached_result: str | None) -> None:
+        self.key = key
+        self.replayed = cached_result is not None
+        self.result = cached_result
+
+
+class IdempotencyService:
+    """Atomic idempotency keys: reserved with an in-progress marker, then replaced by the result."""
+
+    __slots__ = ("_redis", "_reserve")
+
+    def __init__(self, redis: TRedis) -> None:
+        self._redis = redis
+        self._reserve = redis.register_script(RESERVE_SCRIPT)
+
+    @staticmethod
+    def _name(operation: str, key: str) -> str:
+        return f"{settings.redis.prefix}{operation}:{key}"
+
+    async def reserve(self, operation: str, key: str) -> IdempotencyReservation:
+        """Reserve <key> of <operation>, raise 409 while a request with the key is in progress."""
+        name = self._name(operation, key)
+        cached_result = await self._reserve(keys=[name], args=[IN_PROGRESS, settings.redis.reservation_ttl_ms])
+        if cached_result == IN_PROGRESS:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="Request with this idempotency key is in progress."
+            )
+        return IdempotencyReservation(name, cached_result)
+
+    async def complete(self, reservation: IdempotencyReservation) -> None:
+        """Replace the in-progress marker by the result replayed to retries."""
+        stored = await self._redis.set(
+            reservation.key, str(reservation.result), ex=settings.redis.record_expiration_time, xx=True
+        )
+        if not stored:
+            logger.warning(
+                "Reservation %s expired before its result was stored, a retry will run the request again",
+                reservation.key,
+            )
+
+    async def release(self, reservation: IdempotencyReservation) -> None:
+        """Drop the reservation of a failed request so it can be retried."""
+        await self._redis.delete(reservation.key)
+
+    @asynccontextmanager
+    async def guard(self, operation: str, key: str) -> AsyncGenerator[IdempotencyReservation, None]:
+        """Reserve <key> of <operation> for the block, store its result or release on failure."""
+        reservation = await self.reserve(operation, key)
+        if reservation.replayed:
+            logger.info("Replaying result of idempotency key %s", reservation.key)
+            yield reservation
+            return
+        try:
+            yield reservation
+        except BaseException:
+            await self.release(reservation)
+            raise
+        if reservation.result is None:
+            await self.release(reservation)
+        else:
+            await self.complete(reservation)
@@ -2,10 +2,10 @@ from __future__ import annotations
 
 from typing import cast
 
-import itertools
+import time
 
 from fastapi import HTTPException
-from sqlalchemy import and_, func, select
+from sqlalchemy import UUID, and_, column, func, insert, select, values
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
@@ -16,94 +16,109 @@ from interfaces.repositories import RedisRepositoryProtocol
 from models.pg import Order, OrderProduct, Product, Transaction
 from schemas.cache import CacheReadDto, CacheSetDto
 from schemas.entity import OrderSchema
+from services.idempotency import IdempotencyService
 from services.payment import PaymentService
+from services.payment_link_cache import PAID, PaymentLinkCache
+from services.product_catalog import ProductCatalog
 
 logger = get_logger(__name__)
 
 
 class OrderService:
-    def __init__(self, db: AsyncSession, redis_repo: RedisRepositoryProtocol, payment_service: PaymentService):
+    def __init__(
+        self,
+        db: AsyncSession,
+        redis_repo: RedisRepositoryProtocol,
+        payment_service: PaymentService,
+        idempotency_service: IdempotencyService,
+        payment_link_cache: PaymentLinkCache,
+        product_catalog: ProductCatalog,
+    ):
         self._db = db
         self._repo = redis_repo
         self._payment_service = payment_service
-
-    async def _check_idempotency_key(self, order_schema: OrderSchema) -> None:
-        """Checks that idempotency_key is new otherwise raises an exception"""
-
-        key = f"{cfg.redis.prefix}{order_schema.idempotency_key}"
-        result = await self._repo.read(CacheReadDto(name=key))
-        if result:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT, detail="Duplicate request: idempotency key already used."
-            )
-
-    async def _store_argument_pairs_in_cache(self, *args: str) -> None:
-        """Put data in the Redis cache"""
-
-        pairs = itertools.combinations(args, 2)
-        for name, value in pairs:
-            name_ = f"{cfg.redis.prefix}{name}"
-            await self._repo.create(CacheSetDto(name=name_, value=value))
-
-    async def _get_nonexists_products(self, order_schema: OrderSchema) -> set[str]:
-        """Gets a set of products mentionned in <order_schema> but non-existing in the database"""
-
-        products_stmt = select(Product).where(Product.id.in_(order_schema.products_id))
-        res = await self._db.execute(products_stmt)
-        products = res.scalars()
-        existing_product_ids = {str(p.id) for p in products}
-        return set(order_schema.products_id).difference(existing_product_ids)
-
-    async def _calculate_total_order_price(self, order_schema: OrderSchema) -> float:
-        """Creates order price by product prices"""
-
-        total_amount_stmt = select(func.sum(Product.basic_price)).where(Product.id.in_(order_schema.products_id))
-        res = await self._db.execute(total_amount_stmt)
-        total_amount = res.scalar_one_or_none()
-        if total_amount is None:
-            total_amount = 0
-        return cast(float, total_amount)
-
-    async def _create_order_products(self, new_order: Order, order_schema: OrderSchema) -> list[OrderProduct]:
-        """Creates link objects for (order, product) pairs"""
-
-        order_products = []
-        for product_id in order_schema.products_id:
-            new_order_product = OrderProduct(
-                order_id=new_order.id, product_id=product_id, created_at=order_schema.created_at
+        self._idempotency = idempotency_service
+        self._links = payment_link_cache
+        self._catalog = product_catalog
+
+    async def _price_products(self, products_id: list[str]) -> tuple[set[str], float]:
+        """Gets missing products of <products_id> and total price of existing ones"""
+
+        missing, total_amount = self._catalog.snapshot.price(products_id)
+        if not missing:
+            return missing, total_amount
+        # products created after the snapshot was taken are only known to the database
+        return await self._price_products_in_db(products_id)
+
+    async def _price_products_in_db(self, products_id: list[str]) -> tuple[set[str], float]:
+        """Gets missing products of <products_id> and total price of existing ones in one query"""
+
+        requested = (
+            select(values(column("product_id", UUID(as_uuid=False)), name="ids").data([(i,) for i in products_id]))
+            .distinct()
+            .cte("requested")
+        )
+        stmt = select(
+            func.array_agg(requested.c.product_id).filter(Product.id.is_(None)),
+            func.coalesce(func.sum(Product.basic_price), 0),
+        ).select_from(requested.outerjoin(Product, Product.id == requested.c.product_id))
+        missing, total_amount = (await self._db.execute(stmt)).one()
+        return {str(product_id) for product_id in missing or ()}, float(total_amount)
+
+    async def create_order(self, order_schema: OrderSchema, timings: dict[str, float] | None = None) -> Order:
+        """Creates an order by parameters, a repeated idempotency key returns the created order
+
+        Durations of the creation stages in seconds are put to <timings> when it is passed.
+        """
+
+        async with self._idempotency.guard("create_order", order_schema.idempotency_key) as reservation:
+            if reservation.result is not None:
+                return await self.get_order(reservation.result)
+            new_order = await self._create_order(order_schema, {} if timings is None else timings)
+            # the payment link of the order is requested from yookassa under the same key
+            await self._repo.create(
+                CacheSetDto(name=f"{cfg.redis.prefix}{new_order.id}", value=order_schema.idempotency_key)
             )
-            order_products.append(new_order_product)
-        return order_products
-
-    # TODO: add transaction
-    async def create_order(self, order_schema: OrderSchema) -> Order:
-        """Creates an order by parameters"""
-
-        await self._check_idempotency_key(order_schema)
+            reservation.result = str(new_order.id)
+        return new_order
 
-        non_existing_products_ids = await self._get_nonexists_products(order_schema)
+    async def _create_order(self, order_schema: OrderSchema, timings: dict[str, float]) -> Order:
+        started = time.perf_counter()
+        non_existing_products_ids, total_price = await self._price_products(order_schema.products_id)
+        timings["validate"] = time.perf_counter() - started
 
         if non_existing_products_ids:
             detail = f"Products do not exist: {non_existing_products_ids}"
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
 
-        total_price = await self._calculate_total_order_price(order_schema)
-
-        new_order = Order(
-            user_id=order_schema.user_id,
-            status=order_schema.status,
-            currency=order_schema.currency,
-            created_at=order_schema.created_at,
-            total_amount=total_price,
+        started = time.perf_counter()
+        # the order and its products are committed together, so no order is left without products
+        new_order: Order = await self._db.scalar(
+            insert(Order).returning(Order),
+            [
+                {
+                    "user_id": order_schema.user_id,
+                    "status": order_schema.status,
+                    "currency": order_schema.currency,
+                    "created_at": order_schema.created_at,
+                    "total_amount": total_price,
+                }
+            ],
         )
-        self._db.add(new_order)
-        await self._db.commit()
+        if order_schema.products_id:
+            await self._db.execute(
+                insert(OrderProduct).values(
+                    [
+                        {"order_id": new_order.id, "product_id": product_id, "created_at": order_schema.created_at}
+                        for product_id in order_schema.products_id
+                    ]
+                )
+            )
+        timings["insert"] = time.perf_counter() - started
 
-        order_products = await self._create_order_products(new_order, order_schema)
-        self._db.add_all(order_products)
+        started = time.perf_counter()
         await self._db.commit()
-
-        await self._store_argument_pairs_in_cache(order_schema.idempotency_key, new_order.id)
+        timings["commit"] = time.perf_counter() - started
 
         return new_order
 
@@ -115,10 +130,11 @@ class OrderService:
     async def get_payment_link_for_order(self, order_id: str, base_url: str) -> str:
         """Calls yookassa for a payment link by order_id"""
 
-        cached_link = await self._repo.read(CacheReadDto(name=order_id))
-
+        cached_link: str | None = await self._links.get(order_id)
+        if cached_link == PAID:
+            return ""
         if cached_link:
-            return cast(str, cached_link)
+            return cached_link
 
         order = await self.get_order(order_id)
         if order is None:
@@ -132,6 +148,7 @@ class OrderService:
         )
         succeeded_transactions_exists = succeeded_transactions_exists.scalar()
         if succeeded_transactions_exists:
+            await self._links.set_paid([order_id])
             return ""
 
         transaction = Transaction(
@@ -155,7 +172,7 @@ class OrderService:
             transaction_id=transaction.id,
             idempotency_key=idempotency_key,
         )
-        await self._repo.create(CacheSetDto(name=order_id, value=link))
+        await self._links.set_link(order_id, link)
 
         transaction.external_id = external_id
         self._db.add(transaction)
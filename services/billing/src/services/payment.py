@@ -4,7 +4,6 @@ from typing import cast
 
 import uuid
 
-from base64 import b64encode
 from logging import getLogger
 from urllib.parse import urljoin
 
@@ -12,6 +11,7 @@ import httpx
 
 from broker import KafkaMessageSender
 from core.settings import settings
+from helpers.http_client import get_yookassa_auth_header
 from schemas.broker import MessageIn
 from schemas.yookassa import YookassaEventNotification
 
@@ -21,6 +21,9 @@ logger = getLogger(__name__)
 class PaymentService:
     _idempotency_key: str | None = None
 
+    def __init__(self, client: httpx.AsyncClient):
+        self._client = client
+
     @property
     def idempotency_key(self) -> str:
         if self._idempotency_key is None:
@@ -28,10 +31,8 @@ class PaymentService:
         return self._idempotency_key
 
     def get_headers(self) -> dict[str, str]:
-        auth = b64encode(f"{settings.payment.account_id}:{settings.payment.secret_key}".encode()).decode("utf-8")
-
         return {
-            "Authorization": f"Basic {auth}",
+            "Authorization": get_yookassa_auth_header(),
             "Idempotence-Key": self.idempotency_key,
             "Content-Type": "application/json",
         }
@@ -40,41 +41,45 @@ class PaymentService:
         self, base_url: str, amount: float, currency: str, description: str, transaction_id: str, idempotency_key: str
     ) -> tuple[str, str]:
         self._idempotency_key = idempotency_key
-        async with httpx.AsyncClient() as session:
-            headers = self.get_headers()
-            payment_data = {
-                "amount": {"value": str(amount), "currency": currency},
-                "confirmation": {
-                    "type": "redirect",
-                    "return_url": urljoin(
-                        str(base_url), settings.payment.return_url.format(transaction_id=transaction_id)
-                    ),  # TODO: transaction id and order id
-                },
-                "capture": "true",
-                "description": description,
-                "metadata": {"transaction_id": transaction_id},
-            }
-            logger.info("Payment data being sent: %s", payment_data)
-            response = await session.post("https://api.yookassa.ru/v3/payments", headers=headers, json=payment_data)
-            response.raise_for_status()
-            data = response.json()
-            return str(data["confirmation"]["confirmation_url"]), str(data["id"])
+        headers = self.get_headers()
+        payment_data = {
+            "amount": {"value": str(amount), "currency": currency},
+            "confirmation": {
+                "type": "redirect",
+                "return_url": urljoin(
+                    str(base_url), settings.payment.return_url.format(transaction_id=transaction_id)
+                ),  # TODO: transaction id and order id
+            },
+            "capture": "true",
+            "description": description,
+            "metadata": {"transaction_id": transaction_id},
+        }
+        logger.info("Payment data being sent: %s", payment_data)
+        response = await self._client.post(
+            urljoin(settings.payment.api_url, "payments"), headers=headers, json=payment_data
+        )
+        response.raise_for_status()
+        data = response.json()
+        return str(data["confirmation"]["confirmation_url"]), str(data["id"])
 
     async def create_refund_object(self, payment_id: str, amount: float, currency: str) -> str:
-        async with httpx.AsyncClient() as session:
-            headers = self.get_headers()
-            refund_data = {"amount": {"value": str(amount), "currency": currency.upper()}, "payment_id": payment_id}
-            response = await session.post("https://api.yookassa.ru/v3/refunds", headers=headers, json=refund_data)
-            return cast(str, response.json()["id"])
+        headers = self.get_headers()
+        refund_data = {"amount": {"value": str(amount), "currency": currency.upper()}, "payment_id": payment_id}
+        response = await self._client.post(
+            urljoin(settings.payment.api_url, "refunds"), headers=headers, json=refund_data
+        )
+        return cast(str, response.json()["id"])
 
     async def process_payment_result(
         self, message_service: KafkaMessageSender, event_notification: YookassaEventNotification
     ) -> None:
+        # notifications of one transaction share a partition and keep their order
+        metadata = event_notification.object.get("metadata") or {}
         try:
             await message_service.send_message(
                 message=MessageIn(
                     topic=settings.kafka.topic_name,
-                    key=self.idempotency_key,
+                    key=metadata.get("transaction_id") or self.idempotency_key,
                     value=event_notification.model_dump_json(),
                 )
             )
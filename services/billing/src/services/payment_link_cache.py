@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+
+from redis.exceptions import RedisError
+
+from core.logger import get_logger
+from core.settings import settings
+from db.redis import redis_manager
+from helpers.cache import TTLCache
+
+logger = get_logger(__name__)
+
+# Negative entry of an order that is already paid, so no link has to be created
+PAID = "__paid__"
+
+
+class PaymentLinkCache:
+    """Payment links by order id in a per-worker LRU in front of Redis.
+
+    Orders changed by the results processor are evicted from Redis and, through a pub/sub
+    channel, from the memory of every app worker.
+    """
+
+    __slots__ = ("local", "_listener")
+
+    def __init__(self) -> None:
+        self.local: TTLCache[str, str] = TTLCache(maxsize=settings.cache.local_maxsize, ttl=settings.cache.local_ttl)
+        self._listener: asyncio.Task[None] | None = None
+
+    @staticmethod
+    def _name(order_id: str) -> str:
+        return f"{settings.cache.payment_link_prefix}{order_id}"
+
+    async def initialize(self) -> None:
+        """Start listening to evictions made by other processes."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        self.local.clear()
+
+    async def get(self, order_id: str) -> str | None:
+        """Get payment link or ``PAID`` marker of the order."""
+        value: str | None = self.local.get(order_id)
+        if value is None:
+            value = await redis_manager.get_redis().get(self._name(order_id))
+            if value is not None:
+                self.local.set(order_id, value)
+        return value
+
+    async def set_link(self, order_id: str, link: str) -> None:
+        """Cache the link unless the order already has an entry, e.g. was paid meanwhile."""
+        stored = await redis_manager.get_redis().set(
+            self._name(order_id), link, ex=settings.redis.record_expiration_time, nx=True
+        )
+        if stored:
+            self.local.set(order_id, link)
+
+    async def set_paid(self, order_ids: list[str]) -> None:
+        """Replace links of paid orders by the negative entry."""
+        if not order_ids:
+            return
+        async with redis_manager.get_redis().pipeline(transaction=False) as pipe:
+            for order_id in order_ids:
+                pipe.setex(self._name(order_id), settings.redis.record_expiration_time, PAID)
+            pipe.publish(settings.cache.invalidation_channel, ",".join(order_ids))
+            await pipe.execute()
+        for order_id in order_ids:
+            self.local.set(order_id, PAID)
+
+    async def invalidate(self, order_ids: list[str]) -> None:
+        """Drop links of orders, e.g. after their payment was canceled."""
+        if not order_ids:
+            return
+        async with redis_manager.get_redis().pipeline(transaction=False) as pipe:
+            pipe.delete(*(self._name(order_id) for order_id in order_ids))
+            pipe.publish(settings.cache.invalidation_channel, ",".join(order_ids))
+            await pipe.execute()
+        for order_id in order_ids:
+            self.local.delete(order_id)
+
+    async def _subscribe(self) -> None:
+        try:
+            async with redis_manager.get_redis().pubsub() as pubsub:
+                await pubsub.subscribe(settings.cache.invalidation_channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        for order_id in message["data"].split(","):
+                            self.local.delete(order_id)
+        except RedisError:
+            logger.exception("Payment link invalidation listener failed, resubscribing")
+        # evictions could be missed while not subscribed
+        self.local.clear()
+
+    async def _listen(self) -> None:
+        while True:
+            await self._subscribe()
+            await asyncio.sleep(1)
+
+
+payment_link_cache = PaymentLinkCache()
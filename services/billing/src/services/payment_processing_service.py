@@ -1,100 +1,193 @@
 from __future__ import annotations
 
+from typing import Any
+
+import uuid
+
 from datetime import datetime, timedelta
 
+from sqlalchemy import and_, insert, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import select
 
-from core.constraints import OrderStatus
+from core.constraints import OrderStatus, TransactionStatus
 from core.constraints.yookassa import YookassaPaymentStatuses
 from core.logger import get_logger
-from models.pg import Order, OrderProduct, PaymentMethod, Product, Transaction, UserProduct
+from models.pg import Order, OrderProduct, PaymentMethod, Transaction, UserProduct
 from schemas.yookassa import YookassaPaymentObject
 
 logger = get_logger(__name__)
 
+TRANSACTION_STATUSES = {
+    YookassaPaymentStatuses.SUCCEEDED: TransactionStatus.SUCCEEDED,
+    YookassaPaymentStatuses.CANCELED: TransactionStatus.CANCELLED,
+}
+
+# TODO; remove hardcode
+SUBSCRIPTION_PERIOD = timedelta(days=30)
+
 
 class PaymentResultsProcessingService:
     def __init__(self, session: AsyncSession):
         self._session = session
 
-    async def _update_transaction(self, payment_object: YookassaPaymentObject) -> Transaction | None:
-        stmt = select(Transaction).where(Transaction.id == payment_object.metadata.transaction_id)
-        result = await self._session.execute(stmt)
-        transaction = result.scalar_one_or_none()
-        if transaction:
-            # TODO: add mapping from payment obj status to order and transaction status
-            transaction.status = payment_object.status.value
-            self._session.add(transaction)
-        return transaction
-
-    async def _update_order(self, transaction: Transaction) -> Order | None:
-        order_stmt = select(Order).where(Order.id == transaction.order_id)
-        result = await self._session.execute(order_stmt)
-        order = result.scalar_one_or_none()
-        if order:
-            order.status = OrderStatus.PAID
-            self._session.add(order)
-        return order
-
-    async def _save_payment_method(self, payment_token: str, user_id: str) -> None:
-        payment_method = PaymentMethod(user_id=user_id, payment_token=payment_token, payment_method="", description="")
-        self._session.add(payment_method)
-
-    async def _get_products(self, payment_object: YookassaPaymentObject, user_id: str, order_id: str) -> None:
-        user_products_stmt = select(UserProduct).where(UserProduct.user_id == user_id)
-        result = await self._session.execute(user_products_stmt)
-        user_products = result.scalars()
-        user_products = {p.product_id: p for p in user_products}
-
-        order_products_stmt = (
-            select(Product)
-            .join(OrderProduct, Product.id == OrderProduct.product_id)
-            .where(OrderProduct.order_id == order_id)
+    @staticmethod
+    def _latest_per_transaction(payment_objects: list[YookassaPaymentObject]) -> dict[str, YookassaPaymentObject]:
+        """Final payment objects by transaction id, the latest notification of a transaction wins"""
+
+        latest: dict[str, YookassaPaymentObject] = {}
+        for payment_object in payment_objects:
+            if payment_object.status not in TRANSACTION_STATUSES:
+                logger.info("Can't handle payment object with status '%s'. Skip it", payment_object.status)
+                continue
+            if payment_object.metadata is None or payment_object.metadata.transaction_id is None:
+                logger.info("Payment object %s has no transaction id. Skip it", payment_object.id)
+                continue
+            try:
+                # the same form as ids returned by the database
+                transaction_id = str(uuid.UUID(payment_object.metadata.transaction_id))
+            except ValueError:
+                logger.warning(
+                    "Payment object %s has invalid transaction id %r. Skip it",
+                    payment_object.id,
+                    payment_object.metadata.transaction_id,
+                )
+                continue
+            latest[transaction_id] = payment_object
+        return latest
+
+    async def _update_transactions(self, payment_objects: dict[str, YookassaPaymentObject]) -> dict[str, str]:
+        """Moves pending transactions to their final status, returns order id per transaction id
+
+        Transactions which are not pending anymore were handled by an earlier delivery of the same
+        notification, so they are skipped and processing stays idempotent.
+        """
+
+        order_ids: dict[str, str] = {}
+        for status in set(TRANSACTION_STATUSES.values()):
+            transaction_ids = [
+                transaction_id
+                for transaction_id, payment_object in payment_objects.items()
+                if TRANSACTION_STATUSES[payment_object.status] == status
+            ]
+            if not transaction_ids:
+                continue
+            stmt = (
+                update(Transaction)
+                .where(and_(Transaction.id.in_(transaction_ids), Transaction.status == TransactionStatus.PENDING))
+                .values(status=status, updated_at=datetime.now())
+                .returning(Transaction.id, Transaction.order_id)
+            )
+            result = await self._session.execute(stmt)
+            order_ids.update({str(transaction_id): str(order_id) for transaction_id, order_id in result})
+        return order_ids
+
+    async def _update_orders(self, order_ids: list[str]) -> dict[str, str]:
+        """Marks orders paid, returns user id per order id"""
+
+        stmt = (
+            update(Order)
+            .where(Order.id.in_(order_ids))
+            .values(status=OrderStatus.PAID, updated_at=datetime.now())
+            .returning(Order.id, Order.user_id)
         )
+        result = await self._session.execute(stmt)
+        return {str(order_id): str(user_id) for order_id, user_id in result}
+
+    async def _save_payment_methods(self, payment_tokens_per_users: dict[str, str]) -> None:
+        if not payment_tokens_per_users:
+            return
+        rows = [
+            {"user_id": user_id, "payment_token": payment_token, "payment_method": "", "description": ""}
+            for user_id, payment_token in payment_tokens_per_users.items()
+        ]
+        await self._session.execute(insert(PaymentMethod).values(rows))
 
-        results = await self._session.execute(order_products_stmt)
-        order_products = results.scalars()
+    async def _grant_products(self, users_per_orders: dict[str, str], renewals_per_orders: dict[str, bool]) -> None:
+        """Extends bought user products or creates missing ones with two bulk statements
 
-        products_to_add = []
-        products_to_edit = []
+        Every order adds one period, so two paid orders of the same product extend it twice.
+        """
 
-        for product in order_products:
-            if product.id in user_products:
-                product.active_till = product.active_till + timedelta(days=30)
-                products_to_edit.append(product)
+        result = await self._session.execute(
+            select(OrderProduct.order_id, OrderProduct.product_id).where(OrderProduct.order_id.in_(users_per_orders))
+        )
+        bought = [(str(order_id), str(product_id)) for order_id, product_id in result]
+        if not bought:
+            return
+
+        pairs = {(users_per_orders[order_id], product_id) for order_id, product_id in bought}
+        result = await self._session.execute(
+            select(UserProduct.id, UserProduct.user_id, UserProduct.product_id, UserProduct.active_till).where(
+                tuple_(UserProduct.user_id, UserProduct.product_id).in_(list(pairs))
+            )
+        )
+        user_products = {
+            (str(user_id), str(product_id)): (user_product_id, active_till)
+            for user_product_id, user_id, product_id, active_till in result
+        }
+
+        now = datetime.now()
+        to_extend: dict[Any, datetime] = {}
+        to_add: dict[tuple[str, str], dict[str, Any]] = {}
+        for order_id, product_id in bought:
+            key = (users_per_orders[order_id], product_id)
+            if key in user_products:
+                user_product_id, active_till = user_products[key]
+                till = to_extend.get(user_product_id, active_till or now)
+                to_extend[user_product_id] = max(till, now) + SUBSCRIPTION_PERIOD
+            elif key in to_add:
+                to_add[key]["active_till"] += SUBSCRIPTION_PERIOD
+                to_add[key]["renewal_enabled"] |= renewals_per_orders[order_id]
             else:
-                now = datetime.now()
-                new_product = UserProduct(
-                    user_id=user_id,
-                    product_id=product.id,
+                to_add[key] = {
+                    "user_id": key[0],
+                    "product_id": product_id,
                     # check if payment method save
-                    renewal_enabled=payment_object.payment_method.get("saved", False),
-                    active_from=now,
-                    # TODO; remove hardcode
-                    active_till=now + timedelta(days=30),
-                )
-                products_to_add.append(new_product)
-
-        self._session.add_all(products_to_add + products_to_edit)
+                    "renewal_enabled": renewals_per_orders[order_id],
+                    "active_from": now,
+                    "active_till": now + SUBSCRIPTION_PERIOD,
+                    "created_at": now,
+                }
+
+        if to_extend:
+            await self._session.execute(
+                update(UserProduct),
+                [{"id": user_product_id, "active_till": till} for user_product_id, till in to_extend.items()],
+            )
+        if to_add:
+            await self._session.execute(insert(UserProduct).values(list(to_add.values())))
+
+    async def process_payment_results(
+        self, payment_objects: list[YookassaPaymentObject]
+    ) -> dict[str, TransactionStatus]:
+        """Applies a batch of payment results in one transaction, returns new status per order id"""
+
+        latest = self._latest_per_transaction(payment_objects)
+        if not latest:
+            return {}
+        order_ids = await self._update_transactions(latest)
+
+        paid = {
+            transaction_id: order_id
+            for transaction_id, order_id in order_ids.items()
+            if latest[transaction_id].status == YookassaPaymentStatuses.SUCCEEDED
+        }
+        if paid:
+            users_per_orders = await self._update_orders(list(paid.values()))
+            payment_tokens_per_users: dict[str, str] = {}
+            renewals_per_orders: dict[str, bool] = {}
+            for transaction_id, order_id in paid.items():
+                payment_method = latest[transaction_id].payment_method or {}
+                renewals_per_orders[order_id] = bool(payment_method.get("saved", False))
+                if renewals_per_orders[order_id] and order_id in users_per_orders:
+                    payment_tokens_per_users[users_per_orders[order_id]] = payment_method["id"]
+            await self._save_payment_methods(payment_tokens_per_users)
+            await self._grant_products(users_per_orders, renewals_per_orders)
+        return {
+            order_id: TRANSACTION_STATUSES[latest[transaction_id].status]
+            for transaction_id, order_id in order_ids.items()
+        }
 
     async def process_payment_result(self, payment_object: YookassaPaymentObject) -> None:
-        if payment_object.status == YookassaPaymentStatuses.SUCCEEDED:
-            await self.process_success_payment_result(payment_object)
-        elif payment_object.status == YookassaPaymentStatuses.CANCELED:
-            await self.process_canceled_payment_result(payment_object)
-        else:
-            logger.info("Can't handle payment object with status '%s'. Skip it", payment_object.status)
-
-    async def process_success_payment_result(self, payment_object: YookassaPaymentObject) -> None:
-        transaction = await self._update_transaction(payment_object)
-        order = await self._update_order(transaction)
-        user_id = order.user_id  # type: ignore # noqa: PGH003
-
-        if payment_object.payment_method and payment_object.payment_method.get("saved", False):
-            await self._save_payment_method(payment_object.payment_method["id"], user_id)
-
-        await self._get_products(payment_object, user_id, order.id)  # type: ignore # noqa: PGH003
-
-    async def process_canceled_payment_result(self, payment_object: YookassaPaymentObject) -> None:
-        await self._update_transaction(payment_object)
+        await self.process_payment_results([payment_object])
@@ -1,77 +1,215 @@
 from __future__ import annotations
 
-from typing import cast
+from typing import Any, AsyncIterator, Iterator
 
-import asyncio
+import itertools
+import time
 
-from base64 import b64encode
 from collections import defaultdict
 from datetime import datetime
-from http import HTTPStatus
-from uuid import uuid4
 
-import httpx
-
-from sqlalchemy import and_
+from sqlalchemy import ColumnElement, Row, Select, String, and_, cast, func, insert, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import select
 
-from core.constraints import OrderStatus, TransactionStatus, TransactionType
+from core.constraints import Currency, OrderStatus, TransactionStatus, TransactionType
 from core.logger import get_logger
 from core.settings import settings
-from models.pg import Order, PaymentMethod, Transaction, UserProduct
-from schemas.entity import OrderSchema
-from services.order_service import OrderService
+from models.pg import Order, OrderProduct, PaymentMethod, Transaction, UserProduct
+from services.auto_payment_dispatcher import AutoPaymentDispatcher
+from services.product_catalog import ProductCatalog
 
 logger = get_logger(__name__)
 
 
+class RenewalCandidate:
+    """Products of a single user which are due for renewal."""
+
+    __slots__ = ("user_id", "product_ids", "total_amount")
+
+    def __init__(self, user_id: str) -> None:
+        self.user_id = user_id
+        self.product_ids: list[str] = []
+        self.total_amount = 0.0
+
+
 class ProductRenewalService:
-    def __init__(self, session: AsyncSession, order_service: OrderService):
+    def __init__(
+        self,
+        session: AsyncSession,
+        dispatcher: AutoPaymentDispatcher,
+        product_catalog: ProductCatalog,
+        chunk_size: int = settings.renewal.chunk_size,
+        batch_size: int = settings.renewal.batch_size,
+        shards: int = settings.renewal.shards,
+    ):
         self._session = session
-        self._order_service = order_service
-
-    async def _get_products_for_renewal(self) -> dict[str, list[UserProduct]]:
-        stmt = select(UserProduct).where(
-            and_(UserProduct.renewal_enabled == True, UserProduct.active_till <= datetime.now())  # noqa: E712
+        self._dispatcher = dispatcher
+        self._catalog = product_catalog
+        self._chunk_size = chunk_size
+        self._batch_size = batch_size
+        self._shards = shards
+
+    @staticmethod
+    def shard_of(user_id: Any, shards: int) -> ColumnElement[int]:
+        """SQL expression of the shard a user belongs to"""
+
+        return func.hashtext(cast(user_id, String)).op("&")(0x7FFFFFFF) % shards
+
+    def _due_filter(self, now: datetime, shard: int | None) -> ColumnElement[bool]:
+        """Due user products of the shard, users with pending orders are skipped"""
+
+        users_with_pending_orders = select(Order.user_id).where(Order.status == OrderStatus.PENDING)
+        clauses = [
+            UserProduct.renewal_enabled == True,  # noqa: E712
+            UserProduct.active_till <= now,
+            UserProduct.user_id.not_in(users_with_pending_orders),
+        ]
+        if shard is not None:
+            clauses.append(self.shard_of(UserProduct.user_id, self._shards) == shard)
+        return and_(*clauses)
+
+    def _due_page_stmt(self, now: datetime, last_key: tuple[datetime, Any] | None, shard: int | None) -> Select[Any]:
+        """Builds a keyset page of due user products on (active_till, id), seeking on its index"""
+
+        stmt = (
+            select(UserProduct)
+            .where(self._due_filter(now, shard))
+            .order_by(UserProduct.active_till, UserProduct.id)
+            .limit(self._batch_size)
         )
-        result = await self._session.execute(stmt)
-        user_products = result.scalars()
-        products_per_users = defaultdict(list)
-        for product in user_products:
-            products_per_users[product.user_id].append(product)
-        return products_per_users
+        if last_key is not None:
+            stmt = stmt.where(
+                tuple_(UserProduct.active_till, UserProduct.id)
+                > tuple_(*last_key, types=[UserProduct.active_till.type, UserProduct.id.type])
+            )
+        return stmt
 
-    async def _get_users_with_pending_auto_orders(self) -> set[str]:
-        # todo: add this field to model
-        # todo: add Order.type == OrderType.AUTO_CREATED in and_
+    def _due_products_stmt(self, now: datetime, user_ids: list[str]) -> Select[Any]:
+        """Builds all due products of <user_ids>, prices are taken from the product catalog"""
 
-        stmt = select(Order.user_id).where(and_(Order.status == OrderStatus.PENDING)).distinct()
+        return select(UserProduct.user_id, UserProduct.product_id).where(
+            and_(self._due_filter(now, None), UserProduct.user_id.in_(user_ids))
+        )
 
+    async def get_lag(self, shard: int | None = None) -> float:
+        """Seconds since the oldest not yet renewed subscription of the shard became due"""
+
+        now = datetime.now()
+        stmt = select(func.min(UserProduct.active_till)).where(self._due_filter(now, shard))
         result = await self._session.execute(stmt)
-        return set(result.scalars())
+        oldest_due: datetime | None = result.scalar_one_or_none()
+        return (now - oldest_due).total_seconds() if oldest_due else 0.0
+
+    async def get_next_deadline(self) -> datetime | None:
+        """Closest moment in the future when some subscription becomes due"""
 
-    async def _create_orders(self, products_per_users: dict[str, list[UserProduct]]) -> dict[str, Order]:
-        orders_per_users = {}
-        for user_id, products in products_per_users.items():
-            order = await self._order_service.create_order(
-                OrderSchema(user_id=user_id, products_id=[str(p.product_id) for p in products])
+        stmt = select(func.min(UserProduct.active_till)).where(
+            and_(UserProduct.renewal_enabled == True, UserProduct.active_till > datetime.now())  # noqa: E712
+        )
+        result = await self._session.execute(stmt)
+        next_deadline: datetime | None = result.scalar_one_or_none()
+        return next_deadline
+
+    async def _iter_renewal_candidates(self, shard: int | None) -> AsyncIterator[list[RenewalCandidate]]:
+        """Streams keyset pages of due user products on (active_till, id) grouped by user
+
+        Due products of the page users beyond the page are read too, so products of a user are
+        renewed in one order. Orders of a page are committed before the next page is read, their
+        users are skipped by the pending orders filter from then on.
+        The catalog is refreshed at most once per run, when a page has products missing from it.
+        """
+
+        now = datetime.now()
+        last_key: tuple[datetime, Any] | None = None
+        refreshed = False
+        while True:
+            candidates: dict[str, RenewalCandidate] = {}
+            rows = 0
+            async for user_product in await self._session.stream_scalars(self._due_page_stmt(now, last_key, shard)):
+                rows += 1
+                last_key = (user_product.active_till, user_product.id)
+                candidates.setdefault(str(user_product.user_id), RenewalCandidate(str(user_product.user_id)))
+            if not rows:
+                return
+            result = await self._session.stream(self._due_products_stmt(now, list(candidates)))
+            products = [(str(user_id), str(product_id)) async for user_id, product_id in result]
+            snapshot = self._catalog.snapshot
+            if not refreshed and any(snapshot.get_price(product_id) is None for _, product_id in products):
+                # the products could be created after the snapshot was taken
+                await self._catalog.refresh()
+                refreshed = True
+                snapshot = self._catalog.snapshot
+            for user_id, product_id in products:
+                price = snapshot.get_price(product_id)
+                if price is None:
+                    logger.warning("Product %s is not in the catalog, skip its renewal", product_id)
+                    continue
+                candidate = candidates[user_id]
+                candidate.product_ids.append(product_id)
+                candidate.total_amount += price
+            yield [candidate for candidate in candidates.values() if candidate.product_ids]
+            if rows < self._batch_size:
+                return
+
+    def _chunks(self, candidates: list[RenewalCandidate]) -> Iterator[list[RenewalCandidate]]:
+        iterator = iter(candidates)
+        while chunk := list(itertools.islice(iterator, self._chunk_size)):
+            yield chunk
+
+    async def _insert_orders(self, chunk: list[RenewalCandidate]) -> dict[str, str]:
+        """Creates one order per user with a multi-row insert, returns order id per user id"""
+
+        now = datetime.now()
+        stmt = (
+            insert(Order)
+            .values(
+                [
+                    {
+                        "user_id": candidate.user_id,
+                        "status": OrderStatus.PENDING,
+                        "currency": Currency.RUB,
+                        "total_amount": candidate.total_amount,
+                        "created_at": now,
+                    }
+                    for candidate in chunk
+                ]
             )
-            orders_per_users[user_id] = order
-        return orders_per_users
-
-    async def _create_auto_renewal_transactions(self, orders: list[Order]) -> dict[str, Transaction]:
-        transactions_per_orders = {}
-        for order in orders:
-            transactions_per_orders[order.id] = Transaction(
-                order_id=order.id,
-                type=TransactionType.PAYMENT,
-                status=TransactionStatus.PENDING,
-                currency=order.currency,
-                amount=order.total_amount,
+            .returning(Order.id, Order.user_id)
+        )
+        result = await self._session.execute(stmt)
+        return {str(user_id): str(order_id) for order_id, user_id in result}
+
+    async def _insert_order_products(self, chunk: list[RenewalCandidate], orders_per_users: dict[str, str]) -> None:
+        now = datetime.now()
+        rows = [
+            {"order_id": orders_per_users[candidate.user_id], "product_id": product_id, "created_at": now}
+            for candidate in chunk
+            for product_id in candidate.product_ids
+        ]
+        await self._session.execute(insert(OrderProduct).values(rows))
+
+    async def _insert_transactions(
+        self, chunk: list[RenewalCandidate], orders_per_users: dict[str, str]
+    ) -> list[Row[Any]]:
+        stmt = (
+            insert(Transaction)
+            .values(
+                [
+                    {
+                        "order_id": orders_per_users[candidate.user_id],
+                        "type": TransactionType.PAYMENT,
+                        "status": TransactionStatus.PENDING,
+                        "currency": Currency.RUB,
+                        "amount": candidate.total_amount,
+                    }
+                    for candidate in chunk
+                ]
             )
-        self._session.add_all(transactions_per_orders.values())
-        return transactions_per_orders
+            .returning(Transaction.id, Transaction.order_id, Transaction.amount, Transaction.currency)
+        )
+        result = await self._session.execute(stmt)
+        return list(result.all())
 
     async def _get_available_users_payment_methods(self, user_ids: list[str]) -> dict[str, list[str]]:
         stmt = select(PaymentMethod).where(and_(PaymentMethod.user_id.in_(user_ids), PaymentMethod.is_active == True))  # noqa: E712
@@ -79,66 +217,39 @@ class ProductRenewalService:
         results = results.scalars()
         payment_methods_per_users = defaultdict(list)
         for p in results:
-            payment_methods_per_users[p.user_id].append(p.payment_token)
+            payment_methods_per_users[str(p.user_id)].append(p.payment_token)
         return payment_methods_per_users
 
-    async def _create_auto_renewal_payment_object(
-        self, client: httpx.AsyncClient, payment_method_id: str, transaction: Transaction
-    ) -> bool:
-        idempotence_key = str(uuid4())
-        auth = b64encode(f"{settings.payment.account_id}:{settings.payment.secret_key}".encode()).decode("utf-8")
-        headers = {
-            "Authorization": f"Basic {auth}",
-            "Idempotence-Key": idempotence_key,
-            "Content-Type": "application/json",
-        }
-        payment_data = {
-            "amount": {"value": str(transaction.amount), "currency": str(transaction.currency.value).upper()},
-            "payment_method_id": payment_method_id,
-            "capture": True,
-            "description": f"Automatic payment for order №{transaction.order_id}",
-            "metadata": {"transaction_id": transaction.id},
-        }
-        try:
-            response = await client.post("https://api.yookassa.ru/v3/payments", headers=headers, json=payment_data)
-        except Exception as e:
-            return False
-
-        return cast(bool, response.status_code == HTTPStatus.OK)
-
-    async def _create_auto_renewal_payment_objects(
-        self, transactions: list[Transaction], payment_methods_per_transactions: dict[str, list[str]]
-    ) -> None:
-        tasks = []
-        async with httpx.AsyncClient() as client:
-            for transaction in transactions:
-                payment_methods = payment_methods_per_transactions.get(transaction.id)
-                if payment_methods:
-                    task = asyncio.create_task(
-                        self._create_auto_renewal_payment_object(client, payment_methods[0], transaction)
-                    )
-                    tasks.append(task)
-            await asyncio.gather(*tasks)
-
-    # TODO: add transaction here
-    async def run_renewal(self) -> None:
-        products_per_users = await self._get_products_for_renewal()
-        user_ids_to_exclude = await self._get_users_with_pending_auto_orders()
-        products_per_users = {k: v for k, v in products_per_users.items() if k not in user_ids_to_exclude}
-
-        orders_per_users = await self._create_orders(products_per_users)
-        orders = list(orders_per_users.values())
-        transactions_per_orders = await self._create_auto_renewal_transactions(orders)
-
-        users = list(orders_per_users.keys())
-        payment_methods_per_users = await self._get_available_users_payment_methods(users)
-
-        payment_methods_per_transactions = {
-            transactions_per_orders[orders_per_users[user_id].id].id: payment_methods
-            for user_id, payment_methods in payment_methods_per_users.items()
-        }
-
-        transactions = list(transactions_per_orders.values())
+    async def _renew_chunk(self, chunk: list[RenewalCandidate]) -> None:
+        orders_per_users = await self._insert_orders(chunk)
+        await self._insert_order_products(chunk, orders_per_users)
+        transactions = await self._insert_transactions(chunk, orders_per_users)
+        payment_methods_per_users = await self._get_available_users_payment_methods(list(orders_per_users))
         await self._session.commit()
 
-        await self._create_auto_renewal_payment_objects(transactions, payment_methods_per_transactions)
+        users_per_orders = {order_id: user_id for user_id, order_id in orders_per_users.items()}
+        payments = []
+        for transaction in transactions:
+            payment_methods = payment_methods_per_users.get(users_per_orders[str(transaction.order_id)])
+            if payment_methods:
+                payments.append((payment_methods[0], transaction))
+        await self._dispatcher.dispatch(payments)
+
+    async def run_renewal(self, shard: int | None = None) -> None:
+        """Renews due subscriptions, of a single shard if <shard> is set"""
+
+        number = 0
+        async for candidates in self._iter_renewal_candidates(shard):
+            for chunk in self._chunks(candidates):
+                number += 1
+                started = time.perf_counter()
+                await self._renew_chunk(chunk)
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    "Renewal shard %s chunk %s: %s orders in %.3fs (%.1f orders/s)",
+                    shard,
+                    number,
+                    len(chunk),
+                    elapsed,
+                    len(chunk) / elapsed if elapsed else 0.0,
+                )
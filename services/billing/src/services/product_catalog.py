@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from types import MappingProxyType
+
+import asyncio
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from core.logger import get_logger
+from core.settings import settings
+from db.postgres import pg_manager
+from db.redis import redis_manager
+from models.pg import Product
+
+logger = get_logger(__name__)
+
+
+class CatalogSnapshot:
+    """Immutable prices of all products at some catalog version."""
+
+    __slots__ = ("version", "_prices")
+
+    def __init__(self, version: int, prices: dict[str, float]) -> None:
+        self.version = version
+        self._prices = MappingProxyType(prices)
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def get_price(self, product_id: str) -> float | None:
+        return self._prices.get(product_id)
+
+    def price(self, products_id: list[str]) -> tuple[set[str], float]:
+        """Gets missing products of <products_id> and total price of existing ones"""
+
+        missing: set[str] = set()
+        total_amount = 0.0
+        for product_id in set(products_id):
+            price = self._prices.get(product_id)
+            if price is None:
+                missing.add(product_id)
+            else:
+                total_amount += price
+        return missing, total_amount
+
+
+class ProductCatalog:
+    """Per-process snapshot of the product catalog.
+
+    The snapshot is replaced as a whole when a new catalog version is announced in Redis,
+    readers never see a partially loaded catalog.
+    """
+
+    __slots__ = ("snapshot", "_listener")
+
+    def __init__(self) -> None:
+        self.snapshot = CatalogSnapshot(-1, {})
+        self._listener: asyncio.Task[None] | None = None
+
+    async def initialize(self) -> None:
+        """Load the catalog and start following its changes."""
+        if self._listener is None:
+            await self.refresh()
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    async def refresh(self) -> None:
+        """Load all products into a new snapshot."""
+        # the version is read first, so a change made during the load triggers one more refresh
+        version = int(await redis_manager.get_redis().get(settings.catalog.version_key) or 0)
+        async with pg_manager.get_session_maker()() as session:
+            result = await session.execute(select(Product.id, Product.basic_price))
+            prices = {str(product_id): float(price) for product_id, price in result}
+        self.snapshot = CatalogSnapshot(version, prices)
+        logger.info("Product catalog version %s loaded with %s products", version, len(prices))
+
+    async def notify_changed(self) -> None:
+        """Announce a catalog change to every process, including this one."""
+        redis = redis_manager.get_redis()
+        version = await redis.incr(settings.catalog.version_key)
+        await redis.publish(settings.catalog.channel, version)
+
+    async def _subscribe(self) -> None:
+        try:
+            async with redis_manager.get_redis().pubsub() as pubsub:
+                await pubsub.subscribe(settings.catalog.channel)
+                # changes could be missed while not subscribed
+                if int(await redis_manager.get_redis().get(settings.catalog.version_key) or 0) != self.snapshot.version:
+                    await self.refresh()
+                async for message in pubsub.listen():
+                    if message["type"] == "message" and int(message["data"]) > self.snapshot.version:
+                        await self.refresh()
+        except (RedisError, SQLAlchemyError):
+            logger.exception("Product catalog listener failed, resubscribing")
+
+    async def _listen(self) -> None:
+        while True:
+            await self._subscribe()
+            await asyncio.sleep(1)
+
+
+product_catalog = ProductCatalog()
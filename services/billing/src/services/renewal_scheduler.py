@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from typing import AsyncGenerator
+
+import asyncio
+import random
+
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from core.logger import get_logger
+from core.settings import settings
+from db.redis import TRedis
+from services.auto_payment_dispatcher import AutoPaymentDispatcher
+from services.product_auto_renewal_service import ProductRenewalService
+from services.product_catalog import ProductCatalog
+
+logger = get_logger(__name__)
+
+
+class RenewalScheduler:
+    """Runs subscription renewal over user shards shared by any number of worker replicas.
+
+    Every shard is guarded by a transaction-level Postgres advisory lock taken for each pass,
+    so a shard is renewed by one replica at a time while others take the remaining shards.
+    The lock ends with its transaction, so a dropped connection only loses the current pass.
+    Between passes the scheduler sleeps until the closest ``active_till``.
+    """
+
+    __slots__ = (
+        "_engine",
+        "_session_maker",
+        "_redis",
+        "_dispatcher",
+        "_catalog",
+        "_shards",
+        "_lock_namespace",
+        "_min_sleep",
+        "_max_sleep",
+    )
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        session_maker: async_sessionmaker[AsyncSession],
+        redis: TRedis,
+        dispatcher: AutoPaymentDispatcher,
+        product_catalog: ProductCatalog,
+        shards: int = settings.renewal.shards,
+    ) -> None:
+        self._engine = engine
+        self._session_maker = session_maker
+        self._redis = redis
+        self._dispatcher = dispatcher
+        self._catalog = product_catalog
+        self._shards = shards
+        self._lock_namespace: int = settings.renewal.lock_namespace
+        self._min_sleep: float = settings.renewal.min_sleep
+        self._max_sleep: float = settings.renewal.max_sleep
+
+    @asynccontextmanager
+    async def _lock_shard(self, shard: int) -> AsyncGenerator[bool, None]:
+        """Try to lock <shard> in a transaction of a pooled connection kept open for the block."""
+        async with self._engine.connect() as conn, conn.begin():
+            result = await conn.execute(
+                text("SELECT pg_try_advisory_xact_lock(:namespace, :shard)"),
+                {"namespace": self._lock_namespace, "shard": shard},
+            )
+            yield bool(result.scalar_one())
+
+    async def _renew_shard(self, shard: int) -> None:
+        async with self._session_maker() as session:
+            service = ProductRenewalService(session, self._dispatcher, self._catalog, shards=self._shards)
+            await service.run_renewal(shard)
+            lag = await service.get_lag(shard)
+        await self._redis.hset(settings.renewal.lag_key, str(shard), f"{lag:.3f}")
+        logger.info("Renewal shard %s/%s done, lag %.3fs", shard, self._shards, lag)
+
+    async def run_pass(self) -> int:
+        """Renews every shard not locked by another replica, returns amount of renewed shards."""
+        shards = list(range(self._shards))
+        random.shuffle(shards)
+        renewed = 0
+        for shard in shards:
+            async with self._lock_shard(shard) as locked:
+                if not locked:
+                    continue
+                await self._renew_shard(shard)
+                renewed += 1
+        return renewed
+
+    async def get_sleep_time(self) -> float:
+        """Seconds until the closest subscription becomes due, clamped by settings."""
+        async with self._session_maker() as session:
+            service = ProductRenewalService(session, self._dispatcher, self._catalog)
+            next_deadline: datetime | None = await service.get_next_deadline()
+        if next_deadline is None:
+            return self._max_sleep
+        delay = (next_deadline - datetime.now()).total_seconds()
+        return min(max(delay, self._min_sleep), self._max_sleep)
+
+    async def run(self) -> None:
+        while True:
+            renewed = await self.run_pass()
+            sleep_time = await self.get_sleep_time()
+            logger.debug("Renewed %s shards, sleeping %.1fs", renewed, sleep_time)
+            await asyncio.sleep(sleep_time)
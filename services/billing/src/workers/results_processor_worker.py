@@ -1,58 +1,219 @@
+from __future__ import annotations
+
+from typing import Iterable
+
 import asyncio
+import time
 
 import pydantic
 
-from aiokafka import AIOKafkaConsumer
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener, ConsumerRecord, TopicPartition
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
 
+from core.constraints import TransactionStatus
 from core.constraints.yookassa import YookassaObjectTypes
 from core.logger import get_logger
 from core.settings import settings
-from db.postgres import get_pg_session
+from db.postgres import pg_manager
+from db.redis import redis_manager
 from schemas.yookassa import YookassaEventNotification, YookassaPaymentObject
+from services.payment_link_cache import payment_link_cache
 from services.payment_processing_service import PaymentResultsProcessingService
 
 logger = get_logger(__name__)
 
 
+def parse_payment_object(message: ConsumerRecord) -> YookassaPaymentObject | None:
+    try:
+        parsed_message = YookassaEventNotification.parse_raw(message.value)
+        object_type, _ = parsed_message.event.split(".")
+        if object_type == YookassaObjectTypes.PAYMENT:
+            return YookassaPaymentObject.parse_obj(parsed_message.object)
+        # TODO: add refund handler in future
+    except (pydantic.ValidationError, ValueError):
+        logger.info("Can't parse message. Skip it")
+    return None
+
+
+def parse_payment_objects(messages: list[ConsumerRecord]) -> list[YookassaPaymentObject]:
+    return [payment_object for message in messages if (payment_object := parse_payment_object(message))]
+
+
+# The database is unavailable: the batch is retried as a whole, not message by message
+TRANSIENT_ERRORS = (DisconnectionError, InterfaceError, OperationalError, OSError)
+
+
+async def apply_payment_objects(payment_objects: list[YookassaPaymentObject]) -> dict[str, TransactionStatus]:
+    async with pg_manager.get_session_maker()() as session:
+        applied: dict[str, TransactionStatus] = await PaymentResultsProcessingService(session).process_payment_results(
+            payment_objects
+        )
+        await session.commit()
+    return applied
+
+
+async def apply_or_skip(payment_object: YookassaPaymentObject) -> dict[str, TransactionStatus]:
+    try:
+        return await apply_payment_objects([payment_object])
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception:
+        # the payload is logged to be applied by hand once the cause is fixed
+        logger.exception("Can't apply payment object, skip it: %s", payment_object.model_dump_json())
+    return {}
+
+
+async def apply_one_by_one(payment_objects: list[YookassaPaymentObject]) -> dict[str, TransactionStatus]:
+    """Applies payment objects in separate transactions, skips the ones that fail"""
+    applied: dict[str, TransactionStatus] = {}
+    for payment_object in payment_objects:
+        applied.update(await apply_or_skip(payment_object))
+    return applied
+
+
+async def process_batch(messages: list[ConsumerRecord]) -> None:
+    """Applies all messages of a batch in one DB transaction
+
+    A failed batch is retried message by message, so a bad message doesn't block the partition.
+    """
+    started = time.perf_counter()
+    payment_objects = parse_payment_objects(messages)
+    applied: dict[str, TransactionStatus] = {}
+    if payment_objects:
+        try:
+            applied = await apply_payment_objects(payment_objects)
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception:
+            logger.exception("Can't apply batch of %s payment objects, apply them one by one", len(payment_objects))
+            applied = await apply_one_by_one(payment_objects)
+        # cached payment links of changed orders are not valid anymore
+        await payment_link_cache.set_paid(
+            [order_id for order_id, status in applied.items() if status == TransactionStatus.SUCCEEDED]
+        )
+        await payment_link_cache.invalidate(
+            [order_id for order_id, status in applied.items() if status != TransactionStatus.SUCCEEDED]
+        )
+    logger.info(
+        "Processed %s messages (%s applied) in %.3fs", len(messages), len(applied), time.perf_counter() - started
+    )
+
+
+class PartitionWorkers(ConsumerRebalanceListener):
+    """Processes every assigned partition in its own task, keeping order inside a partition."""
+
+    __slots__ = ("_consumer", "_workers")
+
+    def __init__(self, consumer: AIOKafkaConsumer) -> None:
+        self._consumer = consumer
+        self._workers: dict[TopicPartition, tuple[asyncio.Queue[list[ConsumerRecord] | None], asyncio.Task[None]]] = {}
+
+    async def _process(self, partition: TopicPartition, messages: list[ConsumerRecord]) -> bool:
+        """Processes a batch, retrying it with backoff while the database is unavailable.
+
+        Returns False when the partition was revoked meanwhile, its offset is not committed then.
+        """
+        attempt = 0
+        while True:
+            try:
+                await process_batch(messages)
+            except TRANSIENT_ERRORS as e:
+                delay = min(settings.kafka.db_retry_backoff_max, settings.kafka.db_retry_backoff_base * 2**attempt)
+                logger.warning("Can't process batch of %s, retry in %.1fs: %r", partition, delay, e)
+            else:
+                return True
+            await asyncio.sleep(delay)
+            if partition not in self._workers:
+                return False
+            attempt += 1
+
+    async def _work(self, partition: TopicPartition, queue: asyncio.Queue[list[ConsumerRecord] | None]) -> None:
+        while (messages := await queue.get()) is not None:
+            if not await self._process(partition, messages):
+                return
+            # offsets follow the DB commit, redelivered messages are skipped by the service
+            await self._consumer.commit({partition: messages[-1].offset + 1})
+            if queue.empty() and partition in self._consumer.paused():
+                self._consumer.resume(partition)
+
+    def _start(self, partition: TopicPartition) -> None:
+        queue: asyncio.Queue[list[ConsumerRecord] | None] = asyncio.Queue(maxsize=settings.kafka.partition_queue_size)
+        self._workers[partition] = (queue, asyncio.create_task(self._work(partition, queue)))
+        logger.info("Started processing of %s", partition)
+
+    async def _stop(self, partitions: Iterable[TopicPartition]) -> None:
+        """Lets workers finish queued batches and commit their offsets."""
+        stopped = [self._workers.pop(partition) for partition in partitions if partition in self._workers]
+        await asyncio.gather(*(self._finish(queue, task) for queue, task in stopped))
+        logger.info("Stopped processing of %s partitions", len(stopped))
+
+    @staticmethod
+    async def _finish(queue: asyncio.Queue[list[ConsumerRecord] | None], task: asyncio.Task[None]) -> None:
+        # a worker retrying a batch gives up without taking the stop marker from its full queue
+        stop = asyncio.ensure_future(queue.put(None))
+        await asyncio.wait([stop, task], return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def on_partitions_revoked(self, revoked: set[TopicPartition]) -> None:
+        await self._stop(revoked)
+
+    async def on_partitions_assigned(self, assigned: set[TopicPartition]) -> None:
+        for partition in assigned:
+            if partition not in self._workers:
+                self._start(partition)
+
+    async def dispatch(self, batches: dict[TopicPartition, list[ConsumerRecord]]) -> None:
+        """Queues batches to partition workers, pauses partitions whose worker is full.
+
+        Waiting for a full worker would stall every other partition and the consumer poll loop.
+        """
+        for partition, messages in batches.items():
+            worker = self._workers.get(partition)
+            if worker is None or not messages:
+                continue
+            queue, task = worker
+            if task.done():
+                # a failed worker stops the consumer, uncommitted messages are redelivered
+                task.result()
+            if queue.full():
+                # fetched again once the worker drains its queue and resumes the partition
+                self._consumer.seek(partition, messages[0].offset)
+                self._consumer.pause(partition)
+                logger.info("Paused %s until its worker catches up", partition)
+                continue
+            queue.put_nowait(messages)
+
+    async def close(self) -> None:
+        await self._stop(list(self._workers))
+
+
 async def run() -> None:
     kafka_client = AIOKafkaConsumer(
-        settings.kafka.topic_name,
         bootstrap_servers=settings.kafka.bootstrap_servers,
         auto_offset_reset="earliest",
         enable_auto_commit=False,
         group_id=settings.kafka.group_id,
     )
+    workers = PartitionWorkers(kafka_client)
+    kafka_client.subscribe([settings.kafka.topic_name], listener=workers)
+    await pg_manager.initialize()
+    await redis_manager.initialize()
     await kafka_client.start()
 
     try:
-        async for message in kafka_client:
-            async for session in get_pg_session():
-                payment_results_service = PaymentResultsProcessingService(session)
-
-                try:
-                    # TODO: why error catched by outside try ?
-                    parsed_message = YookassaEventNotification.parse_raw(message.value)
-                except pydantic.ValidationError:
-                    logger.info("Can't parse message. Skip it")
-                    continue
-
-                object_type, status = parsed_message.event.split(".")
-
-                if object_type == YookassaObjectTypes.PAYMENT:
-                    object_ = YookassaPaymentObject.parse_obj(parsed_message.object)
-                    await payment_results_service.process_payment_result(object_)
-                elif object_type == YookassaObjectTypes.REFUND:
-                    # TODO: add handler in future
-                    continue
-                else:
-                    continue
-
-                await session.commit()
-                await kafka_client.commit()
+        while True:
+            batches = await kafka_client.getmany(
+                timeout_ms=settings.kafka.batch_timeout_ms, max_records=settings.kafka.batch_max_records
+            )
+            await workers.dispatch(batches)
     except BaseException as e:
         logger.exception("Something went wrong")
     finally:
+        await workers.close()
         await kafka_client.stop()
+        await redis_manager.close()
+        await pg_manager.close()
 
 
 if __name__ == "__main__":
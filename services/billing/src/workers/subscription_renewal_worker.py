@@ -2,29 +2,34 @@ import asyncio
 
 from core.logger import get_logger
 from db import get_redis
-from db.postgres import get_pg_session
+from db.postgres import pg_manager
 from db.redis import redis_manager
-from repositories import get_redis_repo
-from services import get_order_service, get_payment_service
-from services.product_auto_renewal_service import ProductRenewalService
+from helpers.http_client import http_client_manager
+from services.auto_payment_dispatcher import AutoPaymentDispatcher
+from services.product_catalog import product_catalog
+from services.renewal_scheduler import RenewalScheduler
 
 logger = get_logger(__name__)
 
 
 async def run() -> None:
     try:
+        await pg_manager.initialize()
         await redis_manager.initialize()
-        async for session in get_pg_session():
-            order_service = get_order_service(
-                db=session, redis_repo=get_redis_repo(get_redis()), payment_service=get_payment_service()
-            )
-            product_renewal_service = ProductRenewalService(session, order_service)
-            while True:
-                await product_renewal_service.run_renewal()
-                # TODO: use settings for sleep time
-                await asyncio.sleep(3)
+        await http_client_manager.initialize()
+        await product_catalog.initialize()
+        dispatcher = AutoPaymentDispatcher(http_client_manager.get_client())
+        scheduler = RenewalScheduler(
+            pg_manager.get_engine(), pg_manager.get_session_maker(), get_redis(), dispatcher, product_catalog
+        )
+        await scheduler.run()
     except Exception as e:
         logger.exception("Exception:", exc_info=e)
+    finally:
+        await product_catalog.close()
+        await http_client_manager.close()
+        await redis_manager.close()
+        await pg_manager.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+"""Compares a client per payment link with the shared pooled client against the YooKassa stub.
+
+Run from services/billing: PYTHONPATH=src:tests/benchmarks python tests/benchmarks/bench_payment_client.py
+"""
+
+from __future__ import annotations
+
+from typing import Awaitable, Callable
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("YOOKASSA_API_URL", "http://127.0.0.1:8099/v3/")
+os.environ.setdefault("HTTP_CLIENT_HTTP2", "False")
+
+import httpx
+import uvicorn
+
+from helpers.http_client import create_http_client
+from services.payment import PaymentService
+from yookassa_stub import app
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "500"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "20"))
+
+
+async def create_links(make_service: Callable[[], Awaitable[PaymentService]]) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def create_link(number: int) -> None:
+        async with semaphore:
+            service = await make_service()
+            await service.create_payment_link(
+                "http://billing", 100.0, "RUB", "benchmark", str(number), f"bench-{number}"
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(create_link(number) for number in range(REQUESTS)))
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    server = uvicorn.Server(uvicorn.Config(app, port=8099, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    clients: list[httpx.AsyncClient] = []
+
+    async def per_call_service() -> PaymentService:
+        client = httpx.AsyncClient()
+        clients.append(client)
+        return PaymentService(client)
+
+    per_call = await create_links(per_call_service)
+    for client in clients:
+        await client.aclose()
+
+    async with create_http_client() as shared_client:
+
+        async def shared_service() -> PaymentService:
+            return PaymentService(shared_client)
+
+        shared = await create_links(shared_service)
+
+    print(f"client per call: {REQUESTS / per_call:.1f} links/s")
+    print(f"shared client:   {REQUESTS / shared:.1f} links/s")
+
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""Compares pricing of orders by the in-process product catalog with the SQL query.
+
+Needs the Postgres of .env with some products in it.
+Run from services/billing: PYTHONPATH=src python tests/benchmarks/bench_product_catalog.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+
+from sqlalchemy import select
+
+from db.postgres import pg_manager
+from models.pg import Product
+from services.order_service import OrderService
+from services.product_catalog import CatalogSnapshot, ProductCatalog
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "2000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "20"))
+PRODUCTS_PER_ORDER = int(os.getenv("BENCH_PRODUCTS_PER_ORDER", "3"))
+
+
+async def price_orders(catalog: ProductCatalog, product_ids: list[str]) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def price_order() -> None:
+        products_id = random.sample(product_ids, min(PRODUCTS_PER_ORDER, len(product_ids)))
+        async with semaphore, pg_manager.get_session_maker()() as session:
+            service = OrderService(session, None, None, None, None, catalog)  # type: ignore[arg-type]
+            await service._price_products(products_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(price_order() for _ in range(REQUESTS)))
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    await pg_manager.initialize()
+    async with pg_manager.get_session_maker()() as session:
+        result = await session.execute(select(Product.id, Product.basic_price))
+        prices = {str(product_id): float(price) for product_id, price in result}
+    if not prices:
+        print("No products in the database")
+        return
+
+    # an empty snapshot sends every order to the database
+    sql = await price_orders(ProductCatalog(), list(prices))
+    loaded = ProductCatalog()
+    loaded.snapshot = CatalogSnapshot(0, prices)
+    snapshot = await price_orders(loaded, list(prices))
+
+    print(f"SQL query: {REQUESTS / sql:.1f} orders/s")
+    print(f"snapshot:  {REQUESTS / snapshot:.1f} orders/s")
+    await pg_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
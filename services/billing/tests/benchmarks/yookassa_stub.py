@@ -0,0 +1,40 @@
+"""ASGI fake of the YooKassa endpoints used by billing, for offline benchmarks.
+
+Run: uvicorn yookassa_stub:app --port 8099
+and point billing to it with YOOKASSA_API_URL=http://127.0.0.1:8099/v3/
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import asyncio
+import os
+import uuid
+
+from fastapi import FastAPI, Request
+
+LATENCY = float(os.getenv("STUB_LATENCY_MS", "0")) / 1000
+
+app = FastAPI(title="YooKassa stub")
+
+
+@app.post("/v3/payments")
+async def create_payment(request: Request) -> dict[str, Any]:
+    data = await request.json()
+    await asyncio.sleep(LATENCY)
+    payment_id = str(uuid.uuid4())
+    return {
+        "id": payment_id,
+        "status": "pending",
+        "amount": data["amount"],
+        "confirmation": {"type": "redirect", "confirmation_url": f"https://yoomoney.ru/checkout/{payment_id}"},
+        "metadata": data.get("metadata", {}),
+    }
+
+
+@app.post("/v3/refunds")
+async def create_refund(request: Request) -> dict[str, Any]:
+    data = await request.json()
+    await asyncio.sleep(LATENCY)
+    return {"id": str(uuid.uuid4()), "status": "succeeded", "payment_id": data["payment_id"]}
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from services.auto_payment_dispatcher import LatencyHistogram, TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_of_capacity() -> None:
+    bucket = TokenBucket(rate=1, capacity=3)
+    started = time.monotonic()
+    for _ in range(3):
+        await bucket.acquire()
+    assert time.monotonic() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_rate_after_burst() -> None:
+    bucket = TokenBucket(rate=50, capacity=1)
+    started = time.monotonic()
+    for _ in range(6):
+        await bucket.acquire()
+    # the first token is in the bucket, the other five come at 50 per second
+    assert time.monotonic() - started >= 0.09
+
+
+def test_latency_histogram_empty() -> None:
+    histogram = LatencyHistogram()
+    assert histogram.quantile(0.5) == 0.0
+    assert histogram.as_dict() == {"count": 0, "avg": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+
+def test_latency_histogram_quantiles_are_bucket_bounds() -> None:
+    histogram = LatencyHistogram(bounds=(0.1, 1.0))
+    for seconds in (0.01, 0.02, 0.05, 0.5, 3.0):
+        histogram.observe(seconds)
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.8) == 1.0
+    assert histogram.quantile(0.99) == 3.0
+    stats = histogram.as_dict()
+    assert stats["count"] == 5
+    assert stats["avg"] == pytest.approx(3.58 / 5)
+    assert stats["max"] == 3.0
+
+
+def test_latency_histogram_bound_belongs_to_its_bucket() -> None:
+    histogram = LatencyHistogram(bounds=(0.1, 1.0))
+    histogram.observe(0.1)
+    assert histogram.counts == [1, 0, 0]
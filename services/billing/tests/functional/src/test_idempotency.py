@@ -0,0 +1,126 @@
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+
+from fastapi import HTTPException, Request
+from redis.asyncio import Redis
+
+from core.settings import settings
+from services import get_idempotency_reservation
+from services.idempotency import IN_PROGRESS, IdempotencyService
+
+
+@pytest_asyncio.fixture
+async def redis():  # type: ignore  # noqa: PGH003
+    client = Redis(host=settings.redis.host, port=settings.redis.port, decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+def key() -> str:
+    return str(uuid4())
+
+
+def refund_request(order_id: str) -> Request:
+    async def receive():  # type: ignore  # noqa: PGH003
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/billing/api/v1/order/refund_order",
+        "query_string": f"order_id={order_id}".encode(),
+        "headers": [],
+    }
+    return Request(scope, receive)
+
+
+async def refund(service: IdempotencyService, key: str, order_id: str, status: bool) -> str | None:
+    """Run a refund endpoint guarded by <key>, returns the result it replays or stores."""
+    reservations = get_idempotency_reservation(refund_request(order_id), service, key)
+    reservation = await anext(reservations)
+    assert reservation is not None
+    if not reservation.replayed:
+        reservation.result = str(status)
+    with pytest.raises(StopAsyncIteration):
+        await anext(reservations)
+    return reservation.result
+
+
+@pytest.mark.asyncio
+async def test_reserve_marks_key_in_progress(redis, key) -> None:  # type: ignore  # noqa: PGH003
+    service = IdempotencyService(redis)
+    reservation = await service.reserve("create_order", key)
+    assert not reservation.replayed
+    assert reservation.result is None
+    assert await redis.get(reservation.key) == IN_PROGRESS
+    assert 0 < await redis.pttl(reservation.key) <= settings.redis.reservation_ttl_ms
+    await service.release(reservation)
+
+
+@pytest.mark.asyncio
+async def test_reserve_rejects_request_in_progress(redis, key) -> None:  # type: ignore  # noqa: PGH003
+    service = IdempotencyService(redis)
+    reservation = await service.reserve("create_order", key)
+    with pytest.raises(HTTPException) as excinfo:
+        await service.reserve("create_order", key)
+    assert excinfo.value.status_code == 409
+    await service.release(reservation)
+
+
+@pytest.mark.asyncio
+async def test_guard_replays_stored_result(redis, key) -> None:  # type: ignore  # noqa: PGH003
+    service = IdempotencyService(redis)
+    async with service.guard("create_order", key) as reservation:
+        reservation.result = "order-id"
+    assert 0 < await redis.ttl(reservation.key) <= settings.redis.record_expiration_time
+    async with service.guard("create_order", key) as replay:
+        assert replay.replayed
+        assert replay.result == "order-id"
+        replay.result = "ignored"
+    assert await redis.get(reservation.key) == "order-id"
+    await redis.delete(reservation.key)
+
+
+@pytest.mark.asyncio
+async def test_guard_releases_key_on_failure(redis, key) -> None:  # type: ignore  # noqa: PGH003
+    service = IdempotencyService(redis)
+    with pytest.raises(RuntimeError):
+        async with service.guard("create_order", key):
+            raise RuntimeError
+    async with service.guard("create_order", key) as reservation:
+        assert not reservation.replayed
+    assert await redis.exists(reservation.key) == 0
+
+
+@pytest.mark.asyncio
+async def test_guard_scopes_keys_by_operation(redis, key) -> None:  # type: ignore  # noqa: PGH003
+    service = IdempotencyService(redis)
+    async with service.guard("create_order", key) as created:
+        created.result = "order-id"
+    async with service.guard("/billing/api/v1/order/refund_order", key) as refunded:
+        assert not refunded.replayed
+        refunded.result = str(True)
+    assert await redis.get(created.key) == "order-id"
+    assert await redis.get(refunded.key) == str(True)
+    await redis.delete(created.key, refunded.key)
+
+
+@pytest.mark.asyncio
+async def test_complete_does_not_store_expired_reservation(redis, key) -> None:  # type: ignore  # noqa: PGH003
+    service = IdempotencyService(redis)
+    async with service.guard("create_order", key) as reservation:
+        await redis.delete(reservation.key)
+        reservation.result = "order-id"
+    assert await redis.exists(reservation.key) == 0
+
+
+@pytest.mark.asyncio
+async def test_reservation_is_scoped_by_request_arguments(redis, key) -> None:  # type: ignore  # noqa: PGH003
+    service = IdempotencyService(redis)
+    assert await refund(service, key, "first-order", status=True) == str(True)
+    assert await refund(service, key, "second-order", status=False) == str(False)
+    assert await refund(service, key, "first-order", status=False) == str(True)
+    assert await refund(service, key, "second-order", status=True) == str(False)
@@ -0,0 +1,49 @@
+from typing import Any
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.payment_processing_service import SUBSCRIPTION_PERIOD, PaymentResultsProcessingService
+
+
+class FakeSession:
+    """Answers the selects of _grant_products in order and records the writes."""
+
+    def __init__(self, *results: list[tuple[Any, ...]]) -> None:
+        self.results = list(results)
+        self.writes: list[tuple[Any, Any]] = []
+
+    async def execute(self, stmt, params=None):  # type: ignore  # noqa: PGH003
+        if self.results:
+            return self.results.pop(0)
+        self.writes.append((stmt, params))
+        return None
+
+
+@pytest.mark.asyncio
+async def test_grant_products_extends_once_per_order() -> None:
+    active_till = datetime.now() + timedelta(days=10)
+    session = FakeSession(
+        [("order-1", "product"), ("order-2", "product")], [("user-product", "user", "product", active_till)]
+    )
+    service = PaymentResultsProcessingService(session)  # type: ignore[arg-type]
+
+    await service._grant_products({"order-1": "user", "order-2": "user"}, {"order-1": False, "order-2": False})
+
+    [(_, rows)] = session.writes
+    assert rows == [{"id": "user-product", "active_till": active_till + 2 * SUBSCRIPTION_PERIOD}]
+
+
+@pytest.mark.asyncio
+async def test_grant_products_creates_product_with_period_per_order() -> None:
+    session = FakeSession([("order-1", "product"), ("order-2", "product")], [])
+    service = PaymentResultsProcessingService(session)  # type: ignore[arg-type]
+
+    await service._grant_products({"order-1": "user", "order-2": "user"}, {"order-1": False, "order-2": True})
+
+    [(stmt, _)] = session.writes
+    params = stmt.compile().params
+    assert "user_id_m1" not in params
+    assert params["active_till_m0"] - params["active_from_m0"] == 2 * SUBSCRIPTION_PERIOD
+    assert params["renewal_enabled_m0"] is True
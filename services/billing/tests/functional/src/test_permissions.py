@@ -0,0 +1,86 @@
+import pytest
+
+from helpers import cache
+from helpers.cache import TTLCache
+from helpers.permissions import PermissionTrie, compile_permissions
+
+
+@pytest.fixture
+def clock(monkeypatch):  # type: ignore  # noqa: PGH003
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_ttl_cache_expires_entries(clock) -> None:  # type: ignore  # noqa: PGH003
+    ttl_cache = TTLCache(maxsize=10, ttl=5)
+    ttl_cache.set("key", "value")
+    clock[0] += 4.9
+    assert ttl_cache.get("key") == "value"
+    clock[0] += 0.1
+    assert ttl_cache.get("key") is None
+    assert len(ttl_cache) == 0
+
+
+def test_ttl_cache_ttl_only_shortens_lifetime(clock) -> None:  # type: ignore  # noqa: PGH003
+    ttl_cache = TTLCache(maxsize=10, ttl=5)
+    ttl_cache.set("short", 1, ttl=1)
+    ttl_cache.set("long", 2, ttl=60)
+    ttl_cache.set("expired", 3, ttl=0)
+    clock[0] += 2
+    assert ttl_cache.get("short") is None
+    assert ttl_cache.get("long") == 2
+    assert ttl_cache.get("expired") is None
+    clock[0] += 3
+    assert ttl_cache.get("long") is None
+
+
+def test_ttl_cache_evicts_least_recently_used(clock) -> None:  # type: ignore  # noqa: PGH003
+    ttl_cache = TTLCache(maxsize=2, ttl=5)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    assert ttl_cache.get("a") == 1
+    ttl_cache.set("c", 3)
+    assert ttl_cache.get("b") is None
+    assert ttl_cache.get("a") == 1
+    assert ttl_cache.get("c") == 3
+
+
+def test_ttl_cache_delete_and_clear(clock) -> None:  # type: ignore  # noqa: PGH003
+    ttl_cache = TTLCache(maxsize=10, ttl=5)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.delete("a")
+    ttl_cache.delete("missing")
+    assert ttl_cache.get("a") is None
+    ttl_cache.clear()
+    assert len(ttl_cache) == 0
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("/billing/api/v1/order", True),
+        ("/billing/api/v1/order/refund", True),
+        ("/billing/api/v1/orders", True),
+        ("/billing/api/v1/product", False),
+        ("/billing/api/v1/ord", False),
+        ("/auth/api/v1/refund", False),
+        ("/refund/order", True),
+        ("", False),
+    ],
+)
+def test_permission_trie_matches_prefixes(path, expected) -> None:  # type: ignore  # noqa: PGH003
+    trie = PermissionTrie(["/billing/api/v1/order", "/refund"])
+    assert trie.matches(path) is expected
+
+
+def test_permission_trie_empty_permission_matches_everything() -> None:
+    assert PermissionTrie([""]).matches("/any/path")
+    assert not PermissionTrie([]).matches("/any/path")
+
+
+def test_compile_permissions_reuses_trie_of_same_set() -> None:
+    trie = compile_permissions(("/billing/api/v1/order",))
+    assert compile_permissions(("/billing/api/v1/order",)) is trie
+    assert compile_permissions(("/billing/api/v1/product",)) is not trie